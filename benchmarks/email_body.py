@@ -0,0 +1,96 @@
+"""
+EmailTools._get_email_body 邮件正文解码的性能对比
+
+生成一批大型multipart邮件(纯文本+HTML的multipart/alternative、不同声明字符集、
+附带附件)，分别用旧实现(每个部分按 utf-8 → gb2312 → latin1 最多解码三次、
+字符串累加、忽略声明的字符集)和当前实现提取正文，比较耗时和解码是否正确。
+
+用法(在项目根目录):
+    python -m benchmarks.email_body [邮件数 [每封正文KB]]
+"""
+import sys
+import time
+import email
+from email.message import EmailMessage
+from module.email_tools import EmailTools
+
+# (声明的字符集, 正文中重复的句子)
+CHARSETS = [
+    ('utf-8', '性能测试邮件正文，包含中文和 English text. '),
+    ('gb2312', '每周报告：本周完成了索引和连接池的工作。'),
+    ('big5', '繁體中文的電子報內容，測試字元集解碼。'),
+    ('iso-8859-1', 'Café crème brûlée newsletter à la carte. '),
+]
+
+
+def legacy_body(msg) -> str:
+    """旧版 _get_email_body 的实现"""
+    body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition", ""))
+            if "attachment" in content_disposition:
+                continue
+            if content_type == "text/plain" or content_type == "text/html":
+                try:
+                    body += part.get_payload(decode=True).decode('utf-8')
+                except UnicodeDecodeError:
+                    try:
+                        body += part.get_payload(decode=True).decode('gb2312')
+                    except:
+                        body += part.get_payload(decode=True).decode('latin1')
+    else:
+        try:
+            body = msg.get_payload(decode=True).decode('utf-8')
+        except UnicodeDecodeError:
+            try:
+                body = msg.get_payload(decode=True).decode('gb2312')
+            except:
+                body = msg.get_payload(decode=True).decode('latin1')
+    return body.strip()
+
+
+def build_corpus(count: int, body_kb: int) -> list:
+    """生成邮件字节串列表，返回 [(原始邮件, 期望包含的句子)]"""
+    corpus = []
+    for i in range(count):
+        charset, sentence = CHARSETS[i % len(CHARSETS)]
+        repeat = max(1, body_kb * 1024 // len(sentence.encode('utf-8')))
+        text = sentence * repeat
+        msg = EmailMessage()
+        msg['Subject'] = f'newsletter {i}'
+        msg['From'] = 'bench@example.com'
+        msg.set_content(text, charset=charset, cte='base64')
+        msg.add_alternative(f'<html><body><p>{text}</p></body></html>', subtype='html', charset=charset, cte='base64')
+        msg.add_attachment(bytes(range(256)) * (body_kb * 4), maintype='application',
+                           subtype='octet-stream', filename='report.bin')
+        corpus.append((msg.as_bytes(), sentence.strip()))
+    return corpus
+
+
+def measure(name: str, func, messages: list):
+    start = time.perf_counter()
+    bodies = [func(msg) for msg, _ in messages]
+    elapsed = time.perf_counter() - start
+    correct = sum(1 for body, (_, sentence) in zip(bodies, messages) if sentence in body)
+    size = sum(len(body) for body in bodies)
+    print(f'{name}: {elapsed * 1000:9.1f} ms  正确解码 {correct}/{len(messages)}  输出 {size / 1024 / 1024:.1f} M字符')
+    return elapsed
+
+
+def run(count: int, body_kb: int):
+    corpus = build_corpus(count, body_kb)
+    total = sum(len(raw) for raw, _ in corpus)
+    print(f'{count} 封邮件，每封正文约 {body_kb} KB，共 {total / 1024 / 1024:.1f} MB')
+    # 每次都重新解析，避免 email 包内部缓存解码结果影响对比
+    legacy = measure('旧实现', legacy_body,
+                     [(email.message_from_bytes(raw), s) for raw, s in corpus])
+    current = measure('当前实现', EmailTools._get_email_body,
+                      [(email.message_from_bytes(raw), s) for raw, s in corpus])
+    print(f'加速 {legacy / current:.1f}x')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(args[0] if args else 200, args[1] if len(args) > 1 else 256)
@@ -0,0 +1,81 @@
+"""
+GitTools.get_diff 新增/删除行统计的性能对比
+
+在临时目录中生成一个fixture仓库，提交一个改动 N 行的文件，
+分别用旧的逐行重扫实现(O(n²))和当前的单次遍历实现统计行数。
+
+用法(在项目根目录):
+    python -m benchmarks.git_diff_stats [行数 ...]
+"""
+import os
+import sys
+import time
+import tempfile
+from git import Repo
+from module.git_tools import GitTools
+
+# 旧实现在该行数以上耗时过长，只运行新实现
+LEGACY_MAX_LINES = 10000
+
+
+def legacy_count(diff_obj):
+    """旧版 _count_additions / _count_deletions 的统计方式"""
+    diff_text = diff_obj.diff.decode('utf-8')
+    additions = [line for line in diff_text.split('\n') if line.startswith('+') and not line.startswith('+++')]
+    real_additions = 0
+    for line in additions:
+        deletions = [d for d in diff_text.split('\n') if d.startswith('-') and not d.startswith('---')]
+        has_corresponding_deletion = any(d[1:].strip() == line[1:].strip() for d in deletions)
+        if not has_corresponding_deletion or line.strip() != line[1:].strip():
+            real_additions += 1
+    deletions = [line for line in diff_text.split('\n') if line.startswith('-') and not line.startswith('---')]
+    real_deletions = 0
+    for line in deletions:
+        additions = [a for a in diff_text.split('\n') if a.startswith('+') and not a.startswith('+++')]
+        has_corresponding_addition = any(a[1:].strip() == line[1:].strip() for a in additions)
+        if not has_corresponding_addition or line.strip() != line[1:].strip():
+            real_deletions += 1
+    return real_additions, real_deletions
+
+
+def build_fixture(path: str, lines: int) -> str:
+    """创建fixture仓库，第二个提交改写 generated.txt 的全部行，返回该提交的哈希"""
+    repo = Repo.init(path)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'bench')
+        config.set_value('user', 'email', 'bench@example.com')
+    file_path = os.path.join(path, 'generated.txt')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.writelines(f'old line {i}\n' for i in range(lines))
+    repo.index.add(['generated.txt'])
+    repo.index.commit('base')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.writelines(f'new line {i}\n' for i in range(lines))
+    repo.index.add(['generated.txt'])
+    return repo.index.commit('rewrite').hexsha
+
+
+def run(lines: int):
+    with tempfile.TemporaryDirectory() as path:
+        commit_hash = build_fixture(path, lines)
+        git_tools = GitTools(path)
+        commit = git_tools.repo.commit(commit_hash)
+        diff_obj = commit.parents[0].diff(commit, paths=['generated.txt'], create_patch=True)[0]
+
+        start = time.perf_counter()
+        counts = git_tools._count_changes(diff_obj)
+        current = time.perf_counter() - start
+        print(f'{lines:>7} 行  单次遍历: {current * 1000:9.1f} ms  {counts}')
+
+        if lines <= LEGACY_MAX_LINES:
+            start = time.perf_counter()
+            legacy = legacy_count(diff_obj)
+            elapsed = time.perf_counter() - start
+            print(f'{lines:>7} 行  旧实现:   {elapsed * 1000:9.1f} ms  {legacy}  加速 {elapsed / current:.0f}x')
+        else:
+            print(f'{lines:>7} 行  旧实现:   跳过(超过 {LEGACY_MAX_LINES} 行)')
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or [10000, 100000]:
+        run(size)
@@ -1,3 +1,4 @@
+import json
 from mcp.server.fastmcp import FastMCP
 from module.file_system import FileSystem
 from module.cosyvoice_v1 import Cosyvoice
@@ -5,6 +6,7 @@ from module.cosyvoice_v1 import Cosyvoice
 from module.git_tools import GitTools
 from module.dom_tools import DomTools
 from module.github_tools import GitHubTools
+from module.email_tools import EmailTools
 
 mcp = FastMCP("mcp_collection", port=8000)
 
@@ -21,6 +23,41 @@ def get_version_info(html: str, dateSelector: str, descSelector: str = None, ver
     dom = DomTools(html)
     return dom.get_text(dateSelector, descSelector, versionSelector)
 
+@mcp.tool()
+def get_version_fields(html: str, selectors: dict) -> str:
+    """
+    使用这个工具从HTML中一次性提取多个字段
+    参数:
+        html: HTML内容或URL
+        selectors: 字段名到选择器的映射，值为CSS选择器字符串，或
+            {"selector": CSS选择器, "mode": "text"/"html"/"attr", "attr": 属性名, "all": 是否返回所有匹配}
+    返回:
+        str: 字段名到提取结果的JSON字符串
+    """
+    dom = DomTools(html)
+    return json.dumps(dom.extract(selectors), ensure_ascii=False)
+
+@mcp.tool()
+def get_version_fields_batch(urls: list[str], selectors: dict) -> str:
+    """
+    使用这个工具并发获取多个URL，并对每个页面提取同一组字段
+    参数:
+        urls: URL列表
+        selectors: 同get_version_fields的selectors
+    返回:
+        str: URL到提取结果的JSON字符串，单个URL失败时结果包含error字段
+    """
+    return json.dumps(DomTools.extract_urls(urls, selectors), ensure_ascii=False)
+
+@mcp.tool()
+def get_version_info_cache_stats() -> str:
+    """
+    使用这个工具查看get_version_info的已解析文档缓存统计
+    返回:
+        str: 包含缓存条目数、字节数、命中/未命中次数的JSON字符串
+    """
+    return json.dumps(DomTools.cache_stats(), ensure_ascii=False)
+
 def get_git_diff(repository_path: str, file_path: str, commit_hash: str) -> str:
     """
     使用这个工具获取指定文件在指定commit中的diff内容
@@ -35,7 +72,77 @@ def get_git_diff(repository_path: str, file_path: str, commit_hash: str) -> str:
     if isinstance(diff_result, dict):
         return str(diff_result)
     return diff_result
-def get_last_email(imap_server: str, port: int, email_address: str, password: str, inbox: str, subject: str) -> str:
+@mcp.tool()
+def get_commit_diff(repository_path: str, revision: str, paths: list[str] = None, ignore_whitespace: bool = True,
+                    max_patch_bytes: int = 65536, max_total_bytes: int = 1048576) -> str:
+    """
+    使用这个工具一次获取某个commit或提交区间内所有改动文件的diff
+    参数:
+        repository_path: git仓库路径
+        revision: commit哈希/引用，或 "A..B" 形式的提交区间
+        paths: 只包含这些路径(可选，为空则包含全部文件)
+        ignore_whitespace: 是否忽略空白字符变化
+        max_patch_bytes: 单个文件patch的最大字节数，超出部分截断并带截断标记
+        max_total_bytes: 所有patch的总字节数上限，用尽后其余文件只返回统计
+    返回:
+        str: JSON字符串，包含每个文件的变更类型、新增/删除行数、patch和是否被截断
+    """
+    git = GitTools(repository_path)
+    result = git.get_commit_diff(revision, paths, ignore_whitespace, max_patch_bytes, max_total_bytes)
+    return json.dumps(result, ensure_ascii=False)
+
+@mcp.tool()
+def git_log(repository_path: str, path: str = None, author: str = None, since: str = None, until: str = None,
+            grep: str = None, max_count: int = 50, skip: int = 0, revision: str = "HEAD") -> str:
+    """
+    使用这个工具查询git提交历史，例如"最近6个月哪些提交修改了某个文件"
+    参数:
+        repository_path: git仓库路径
+        path: 只包含修改过该路径的提交(可选)
+        author: 作者名或邮箱，支持正则(可选)
+        since: 起始时间，如"2024-01-01"或"6 months ago"(可选)
+        until: 截止时间(可选)
+        grep: 提交信息匹配的正则(可选)
+        max_count: 每页提交数，默认50
+        skip: 分页偏移，传入上一页返回的next_skip获取下一页
+        revision: 从哪个引用开始查询，默认HEAD
+    返回:
+        str: JSON字符串，包含提交列表(commit_hash/author/email/date/subject)、has_more和next_skip
+    """
+    git = GitTools(repository_path)
+    result = git.get_log(path, author, since, until, grep, max_count, skip, revision)
+    return json.dumps(result, ensure_ascii=False)
+
+@mcp.tool()
+def git_blame(repository_path: str, file_path: str, revision: str = "HEAD", start_line: int = None,
+              end_line: int = None) -> str:
+    """
+    使用这个工具获取文件每一行最后一次修改所在的提交和作者
+    参数:
+        repository_path: git仓库路径
+        file_path: 文件路径（相对于仓库根目录）
+        revision: commit哈希或引用，默认HEAD
+        start_line: 起始行号，从1开始(可选)
+        end_line: 结束行号，包含该行(可选)
+    返回:
+        str: JSON字符串，lines为每行对应的提交，commits为这些提交的作者、日期和摘要
+    """
+    git = GitTools(repository_path)
+    result = git.get_blame(file_path, revision, start_line, end_line)
+    return json.dumps(result, ensure_ascii=False)
+
+@mcp.tool()
+def get_git_diff_cache_stats() -> str:
+    """
+    使用这个工具查看git diff结果缓存的统计
+    返回:
+        str: JSON字符串，包含缓存条目数、字节数、内存/磁盘命中次数、未命中次数和淘汰次数
+    """
+    return json.dumps(GitTools.diff_cache_stats(), ensure_ascii=False)
+
+@mcp.tool()
+def get_last_email(imap_server: str, port: int, email_address: str, password: str, inbox: str, subject: str,
+                   incremental: bool = False, html_to_text: bool = False) -> str:
     """
     使用这个工具获取指定邮箱中最新的邮件内容
     参数:
@@ -45,31 +152,102 @@ def get_last_email(imap_server: str, port: int, email_address: str, password: st
         password: 邮箱密码
         inbox: 收件箱名称
         subject: 邮件主题(可选,为空则获取最新邮件)
+        incremental: 是否先增量同步到本地索引，再从索引中查找，适合反复轮询同一邮箱
+        html_to_text: 是否把HTML正文转换为纯文本
     返回:
         str: 邮件内容
         如果没有找到匹配的邮件则返回空字符串
     """
-    result = EmailTools.getLastEmail(imap_server, port, email_address, password, inbox, subject)
+    result = EmailTools.getLastEmail(imap_server, port, email_address, password, inbox, subject,
+                                     incremental, html_to_text)
     if result is None:
         return ""  # 如果返回None则返回空字符串
     return result
 
 @mcp.tool()
-def read_file(file_path: str) -> str:
+def get_last_emails(imap_server: str, port: int, email_address: str, password: str, inbox: str,
+                    subject: str = None, sender: str = None, since: str = None, limit: int = 10,
+                    include_attachments: bool = False) -> str:
+    """
+    使用这个工具获取最近N封符合条件的邮件，返回发件人、日期、主题、正文和附件信息
+    参数:
+        imap_server: IMAP服务器地址
+        port: IMAP服务器端口
+        email_address: 邮箱地址
+        password: 邮箱密码
+        inbox: 收件箱名称
+        subject: 主题关键词(可选)
+        sender: 发件人关键词(可选)
+        since: 起始时间(可选)，格式为 YYYY-MM-DD 或 ISO 8601 时间
+        limit: 最多返回的邮件数量，默认10
+        include_attachments: 是否返回附件内容(base64)，默认只返回附件的文件名、类型和大小
+    返回:
+        str: JSON字符串，按到达时间从新到旧排列的邮件列表(uid/from/to/date/subject/text/html/attachments)
+    """
+    try:
+        result = EmailTools.getLastEmails(imap_server, port, email_address, password, inbox,
+                                          subject, sender, since, limit, include_attachments)
+    except Exception as e:
+        result = {"error": f"获取邮件失败: {str(e)}"}
+    return json.dumps(result, ensure_ascii=False)
+
+@mcp.tool()
+def search_indexed_emails(imap_server: str, port: int, email_address: str, password: str, inbox: str,
+                          subject: str = None, since: str = None, limit: int = 20) -> str:
+    """
+    使用这个工具把邮箱增量同步到本地索引后查询邮件，只下载上次同步之后的新邮件
+    参数:
+        imap_server: IMAP服务器地址
+        port: IMAP服务器端口
+        email_address: 邮箱地址
+        password: 邮箱密码
+        inbox: 收件箱名称
+        subject: 主题关键词(可选)
+        since: 起始时间(可选)，格式为 YYYY-MM-DD 或 ISO 8601 时间
+        limit: 最多返回的邮件数量，默认20
+    返回:
+        str: JSON字符串，包含同步结果sync和按到达时间从新到旧排列的邮件列表emails(uid/subject/from/date/body)
+    """
+    try:
+        result = EmailTools.searchIndexedEmails(imap_server, port, email_address, password, inbox,
+                                                subject, since, limit)
+    except Exception as e:
+        result = {"error": f"查询邮件失败: {str(e)}"}
+    return json.dumps(result, ensure_ascii=False)
+
+@mcp.tool()
+def get_email_pool_stats() -> str:
     """
-    使用这个工具读取文件内容
+    使用这个工具查看IMAP连接池的统计
+    返回:
+        str: JSON字符串，包含空闲连接数、新建连接数、复用次数和重连次数
+    """
+    return json.dumps(EmailTools.pool_stats(), ensure_ascii=False)
+
+@mcp.tool()
+def read_file(file_path: str, offset: int = None, length: int = None,
+              start_line: int = None, end_line: int = None, tail_lines: int = None) -> str:
+    """
+    使用这个工具读取文件内容，大文件可以只读取其中一段
     参数:
         file_path: 文件路径
+        offset: 起始字节偏移(可选，按字节范围读取)
+        length: 读取的字节数(可选，为空则读到文件末尾)
+        start_line: 起始行号，从1开始(可选，按行范围读取)
+        end_line: 结束行号，包含该行(可选，为空则读到文件末尾)
+        tail_lines: 读取文件末尾的行数(可选)
+    三种范围读取方式只能选择一种，都为空时读取整个文件
     """
-    return FileSystem.read_file(file_path)
+    return FileSystem.read_file(file_path, offset, length, start_line, end_line, tail_lines)
 
 @mcp.tool()
-def write_file(file_path: str, content: str) -> str:
+def write_file(file_path: str, content: str, append: bool = False) -> str:
     """
     Use this tool to write content to a specified file
     Parameters:
         file_path: Target file path
         content: Content to write
+        append: Append to the end of the file instead of overwriting it
         
     Returns:
         str: Operation result string
@@ -77,20 +255,42 @@ def write_file(file_path: str, content: str) -> str:
             FileNotFoundError: When file path does not exist
             IOError: When write operation fails
     """
-    return FileSystem.write_file(file_path, content)
+    return FileSystem.write_file(file_path, content, append)
+
+@mcp.tool()
+def write_files(files: list[dict], append: bool = False) -> str:
+    """
+    Use this tool to write many files in one call
+    Parameters:
+        files: List of files to write, each item is {"path": target file path, "content": content to write}
+        append: Append to the end of each file instead of overwriting it
+
+    Files are written to temporary files first and then renamed into place,
+    so a failure while writing leaves every target file untouched.
+
+    Returns:
+        str: Operation result string
+        May raise:
+            ValueError: When an item has no path
+            IOError: When write operation fails
+    """
+    return FileSystem.write_files(files, append)
 
 @mcp.tool()
-def copy_dir(from_path: str, to_path: str) -> str:
+def copy_dir(from_path: str, to_path: str, incremental: bool = False, use_hash: bool = False) -> str:
     """
     This tool is used to copy files from one directory to another. A new directory named with current timestamp will be created in the destination path, and all files (excluding subdirectories) from source directory will be copied to it.
     Parameters:
         from_path: Source directory path containing files to copy
         to_path: Destination directory path where files will be copied to
+        incremental: Skip files unchanged since the last copy, using a manifest kept in the destination
+        use_hash: In incremental mode, compare BLAKE2 hashes of files whose size matches but mtime differs
     Returns:
         success: When files are copied successfully
+        JSON report: In incremental mode, bytes copied, bytes skipped and throughput
         FileNotFoundError: When source directory does not exist
     """
-    return FileSystem.copy_dir(from_path, to_path)
+    return FileSystem.copy_dir(from_path, to_path, incremental, use_hash)
 
 @mcp.tool()
 def create_text_to_audio(text: str, out_path: str) -> str:
@@ -105,6 +305,57 @@ def create_text_to_audio(text: str, out_path: str) -> str:
     """
     return Cosyvoice.generate_audio(text, out_path)
 
+@mcp.tool()
+def create_text_to_audio_batch(items: list, max_workers: int = 4) -> str:
+    """
+    This tool converts multiple texts into audio files concurrently over a bounded pool of reused synthesizer sessions.
+    Parameters:
+        items: List of {"text": text, "out_path": output audio file path} (or [text, out_path] pairs)
+        max_workers: Maximum number of texts synthesized at the same time, default 4
+    Returns:
+        JSON string with succeeded/failed counts, total seconds, and per-item out_path/status/seconds/bytes/cached/error in input order
+    """
+    return json.dumps(Cosyvoice.generate_audio_batch(items, max_workers), ensure_ascii=False)
+
+@mcp.tool()
+def create_text_to_audio_stream(text: str, out_path: str, segment_chars: int = 200, max_workers: int = 4) -> str:
+    """
+    This tool converts long text into audio in streaming mode: the text is split at sentence boundaries, segments are synthesized concurrently, and audio is written to a temp file as it arrives, then atomically renamed to out_path.
+    Parameters:
+        text: String text, e.g. a long narration
+        out_path: Output path for the audio file
+        segment_chars: Maximum characters per segment, default 200
+        max_workers: Maximum number of segments synthesized at the same time, default 4
+    Returns:
+        JSON string with status, out_path, bytes, segments, cached, first_byte_seconds (time to first byte written), seconds and error
+    """
+    return json.dumps(Cosyvoice.generate_audio_stream(text, out_path, segment_chars, max_workers), ensure_ascii=False)
+
+@mcp.tool()
+def prewarm_tts_cache(texts: list, max_workers: int = 4) -> str:
+    """
+    This tool synthesizes a list of texts into the TTS audio cache ahead of time; texts already cached are skipped.
+    Parameters:
+        texts: List of texts, e.g. titles or poem lines that will be reused across drafts
+        max_workers: Maximum number of texts synthesized at the same time, default 4
+    Returns:
+        JSON string with cached/synthesized/failed counts and errors
+    """
+    try:
+        result = Cosyvoice.prewarm_cache(texts, max_workers)
+    except Exception as e:
+        result = {"error": str(e)}
+    return json.dumps(result, ensure_ascii=False)
+
+@mcp.tool()
+def get_tts_cache_stats() -> str:
+    """
+    This tool returns statistics of the content-addressed TTS audio cache.
+    Returns:
+        JSON string with directory, entries, bytes, max_bytes, hits, misses, evictions, linked and copied counts
+    """
+    return json.dumps(Cosyvoice.cache_stats(), ensure_ascii=False)
+
 @mcp.tool()
 def auto_cut(draft_path: str) -> str:
     """
@@ -112,25 +363,52 @@ def auto_cut(draft_path: str) -> str:
     Parameters:
         draft_path: Draft path
     Returns:
-        success: When files are copied successfully
+        JSON string with status "Success", per-phase wall-clock timings in seconds (resolve/probe/assemble/dump/export) and media cache stats
     """
     ac = autoCut(draft_path, '浮光.mp3','水墨山河.mp4');
-    ac.general_draft();
-    return "Success"
+    return json.dumps(ac.general_draft(), ensure_ascii=False)
 
 @mcp.tool()
-def get_github_repo_info(repo_url: str) -> str:
+def get_github_repo_info(repo_url: str, backend: str = "rest") -> str:
     """
     获取GitHub仓库的最新版本、更新日期和更新说明
     参数:
         repo_url: GitHub仓库URL
+        backend: "rest"或"graphql"(需要GITHUB_TOKEN，失败时退回REST)
     返回:
         str: 包含仓库最新版本、更新日期和更新说明的JSON字符串
     """
-    result = GitHubTools.get_github_repo_info(repo_url)
+    result = GitHubTools.get_github_repo_info(repo_url, backend)
     if result is None:
         return "获取仓库信息失败"
     return str(result)
 
+@mcp.tool()
+def get_github_repos_info(repo_urls: list[str], backend: str = "rest") -> str:
+    """
+    并发获取多个GitHub仓库的最新版本、更新日期和更新说明
+    参数:
+        repo_urls: GitHub仓库URL列表
+        backend: "rest"每个仓库单独请求；"graphql"把多个仓库合并到一个查询中
+                 (需要GITHUB_TOKEN，出错的仓库退回REST)
+    返回:
+        str: JSON字符串，包含每个仓库的结果(results)、命中缓存的仓库数(from_cache)
+             以及剩余API配额(rate_limit_remaining/rate_limit_reset)
+    """
+    return json.dumps(GitHubTools.get_github_repos_info(repo_urls, backend=backend), ensure_ascii=False)
+
+@mcp.tool()
+def get_github_rate_limit_stats() -> str:
+    """
+    查看GitHub API客户端限流器的状态
+    返回:
+        str: JSON字符串，按配额类型(core/graphql)给出排队请求数、剩余配额、重置时间和等待时间统计
+    """
+    return json.dumps(GitHubTools.rate_limit_stats(), ensure_ascii=False)
+
 if __name__ == "__main__":
-    mcp.run(transport='sse')
\ No newline at end of file
+    try:
+        mcp.run(transport='sse')
+    finally:
+        # 语音合成对象池的重连线程不是守护线程，不关闭时进程无法退出
+        Cosyvoice.shutdown()
\ No newline at end of file
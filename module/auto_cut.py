@@ -1,4 +1,13 @@
 import os
+import re
+import time
+import uuid
+import logging
+import tempfile
+import importlib
+import threading
+from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 import pyJianYingDraft as draft
 from pyJianYingDraft import Intro_type, Transition_type, trange
 from pyJianYingDraft import TextIntro, TextOutro, Text_loop_anim, Mask_type
@@ -6,10 +15,153 @@ from pyJianYingDraft import animation
 from pyJianYingDraft.script_file import json
 from pyJianYingDraft.jianying_controller import ExportResolution, ExportFramerate
 
+logger = logging.getLogger(__name__)
+
+# 素材元数据缓存文件名，保存在草稿的 Resources 目录中
+MEDIA_CACHE_FILE = '.media_cache.json'
+# 只还原这个包中的类，缓存文件被改动时也不会实例化其他类
+_MATERIAL_PACKAGE = 'pyJianYingDraft'
+# 并发解析素材的线程数
+PROBE_WORKERS = 8
+# 配音分段文件名：{peiyin}{0-9}.mp3
+_SEGMENT_RE = re.compile(r'^(.*)(\d)\.mp3$')
+
+
+class _MediaCache:
+    """
+    素材元数据缓存
+
+    pyJianYingDraft 创建 AudioMaterial / VideoMaterial 时会解析媒体文件获取时长等信息。
+    这里按 (路径, 文件大小, 修改时间) 缓存解析后的素材属性，并持久化在草稿的
+    Resources 目录中；文件未变化时直接还原素材对象，重新生成草稿不再重复解析
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def material(self, cls, path: str):
+        """返回 cls(path) 创建的素材，文件未变化时使用缓存"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        signature = [cls.__name__, stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry['signature'] == signature:
+            try:
+                material = _MediaCache._restore(entry['state'])
+                # 素材ID每次创建都是随机生成的，同一文件多次使用时不能重复
+                if hasattr(material, 'material_id'):
+                    material.material_id = uuid.uuid4().hex
+                material.path = path
+                with self._lock:
+                    self.hits += 1
+                return material
+            except (KeyError, TypeError, ValueError, AttributeError, ImportError):
+                pass
+
+        material = cls(path)
+        try:
+            state = _MediaCache._snapshot(material)
+        except TypeError:
+            # 含有无法序列化的属性，不缓存
+            state = None
+        with self._lock:
+            self.misses += 1
+            if state is not None:
+                self._entries[key] = {"signature": signature, "state": state}
+                self._dirty = True
+        return material
+
+    def save(self):
+        """有新解析的素材时把缓存写回磁盘(临时文件+原子替换)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries, ensure_ascii=False)
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _snapshot(value):
+        """把素材对象转换为可JSON序列化的结构，遇到不支持的类型时抛出TypeError"""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [_MediaCache._snapshot(item) for item in value]
+        if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+            return {"__dict__": {k: _MediaCache._snapshot(v) for k, v in value.items()}}
+        cls = type(value)
+        if not cls.__module__.startswith(_MATERIAL_PACKAGE):
+            raise TypeError(f"无法缓存的属性类型: {cls.__name__}")
+        name = f'{cls.__module__}:{cls.__qualname__}'
+        if isinstance(value, Enum):
+            return {"__enum__": name, "name": value.name}
+        return {"__object__": name, "attrs": {k: _MediaCache._snapshot(v) for k, v in vars(value).items()}}
+
+    @staticmethod
+    def _restore(data):
+        """_snapshot 的逆过程，对象不经过 __init__ 创建，因此不会重新解析媒体文件"""
+        if isinstance(data, list):
+            return [_MediaCache._restore(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+        if "__dict__" in data:
+            return {k: _MediaCache._restore(v) for k, v in data["__dict__"].items()}
+        name = data.get("__enum__") or data["__object__"]
+        module_name, _, qualname = name.partition(':')
+        if module_name.split('.')[0] != _MATERIAL_PACKAGE:
+            raise ValueError(f"不允许还原的类型: {name}")
+        cls = importlib.import_module(module_name)
+        for part in qualname.split('.'):
+            cls = getattr(cls, part)
+        if "__enum__" in data:
+            return cls[data["name"]]
+        obj = cls.__new__(cls)
+        for k, v in data["attrs"].items():
+            setattr(obj, k, _MediaCache._restore(v))
+        return obj
+
+
+def _scan_segments(directory: str) -> dict:
+    """扫描一次配音目录，返回 {peiyin: [0-9号分段的路径，按序号排列]}"""
+    segments = {}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return segments
+    for entry in entries:
+        match = _SEGMENT_RE.match(entry.name)
+        if match and entry.is_file():
+            segments.setdefault(match.group(1), []).append((int(match.group(2)), entry.path))
+    return {peiyin: [path for _, path in sorted(paths)] for peiyin, paths in segments.items()}
+
 
 class autoCut():
 
-    def __init__(self, draft_path: str = "", bgm: str = "", bgv: str = ""):
+    def __init__(self, draft_path: str = "", bgm: str = "", bgv: str = "", probe_workers: int = PROBE_WORKERS):
         self.nowS = 0
         self.bgm = bgm
         self.bgv = bgv
@@ -17,6 +169,15 @@ class autoCut():
         self.output_dir = draft_path + "/Resources/"
         self.bgm_dir = draft_path + "/Resources/bgm/"
         self.bgv_dir = draft_path + "/Resources/bgv/"
+        self.media_cache = _MediaCache(os.path.join(self.output_dir, MEDIA_CACHE_FILE))
+        self.audio_segments = None
+        self.probe_workers = probe_workers
+        self.title_data = None
+        self.item_data = None
+        # 预先解析好的素材，{(类型, 路径): 素材}
+        self.prefetched = {}
+        # 各阶段耗时(秒)
+        self.timings = {}
         self.script = draft.ScriptFile(1920, 1080)
         self.script.add_track(draft.TrackType.audio, 'TTS')
         self.script.add_track(draft.TrackType.audio, 'BGM')
@@ -34,8 +195,61 @@ class autoCut():
         self.script.add_track(draft.TrackType.text, 'SX')
         self.script.add_track(draft.TrackType.text, 'SY')
 
+    def audioMaterial(self, path: str):
+        material = self.prefetched.pop(('audio', path), None)
+        return material if material is not None else self.media_cache.material(draft.AudioMaterial, path)
+
+    def videoMaterial(self, path: str):
+        material = self.prefetched.pop(('video', path), None)
+        return material if material is not None else self.media_cache.material(draft.VideoMaterial, path)
+
+    def loadTitle(self) -> dict:
+        if self.title_data is None:
+            with open(os.path.join(self.output_dir, 'json/title.json'), 'r', encoding='utf-8') as f:
+                self.title_data = json.load(f)
+        return self.title_data
+
+    def loadItems(self):
+        if self.item_data is None:
+            with open(os.path.join(self.output_dir, "json/item.json"), 'r', encoding='utf-8') as f:
+                self.item_data = json.load(f)['lists']
+        return self.item_data
+
+    def resolveMaterials(self) -> list:
+        """
+        第一阶段：解析 title.json / item.json，列出草稿用到的所有音视频文件
+
+        Returns:
+            [(类型, 路径)]，类型为 'audio' 或 'video'
+        """
+        self.loadTitle()
+        items = self.loadItems()
+        files = [('audio', os.path.join(self.output_dir, 'audioAlg/t0.mp3')),
+                 ('video', os.path.join(self.bgv_dir, "金粉向右飘.mp4"))]
+        for _, item in items.items() if isinstance(items, dict) else enumerate(items):
+            files.extend(('audio', path) for path in self.peiyinSegments(item['peiyin']))
+        files.append(('audio', os.path.join(self.bgm_dir, self.bgm)))
+        files.append(('video', os.path.join(self.bgv_dir, self.bgv)))
+        return list(dict.fromkeys(files))
+
+    def prefetchMaterials(self, files: list):
+        """第二阶段：在线程池中并发解析所有素材"""
+        def probe(file):
+            kind, path = file
+            cls = draft.AudioMaterial if kind == 'audio' else draft.VideoMaterial
+            return self.media_cache.material(cls, path)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.probe_workers, len(files) or 1))) as pool:
+            self.prefetched.update(zip(files, pool.map(probe, files)))
+
+    def peiyinSegments(self, peiyin: str) -> list:
+        """返回配音的各分段文件路径，首次调用时扫描一次 audioAlg 目录"""
+        if self.audio_segments is None:
+            self.audio_segments = _scan_segments(os.path.join(self.output_dir, 'audioAlg'))
+        return self.audio_segments.get(peiyin, [])
+
     def addBgm(self):
-        audio_bgm = draft.AudioMaterial(os.path.join(self.bgm_dir, self.bgm))
+        audio_bgm = self.audioMaterial(os.path.join(self.bgm_dir, self.bgm))
         audio_bgm_lenth = audio_bgm.duration
         self.script.add_material(audio_bgm)
         audio_bgm_segment = draft.AudioSegment(audio_bgm, trange(0, self.nowS),volume=0.2)
@@ -51,7 +265,7 @@ class autoCut():
         TextSegment.add_animation(TextOutro.渐隐, 500000)
         self.script.add_segment(TextSegment, 'SY')
                 # 诗词背景
-        video_material = draft.VideoMaterial(os.path.join(self.bgv_dir, self.bgv))
+        video_material = self.videoMaterial(os.path.join(self.bgv_dir, self.bgv))
         video_duration = video_material.duration
         self.script.add_material(video_material)
         video_segment = draft.VideoSegment(material = video_material,
@@ -60,7 +274,7 @@ class autoCut():
         self.script.add_segment(video_segment, 'BGVC')
         
     def addTitle(self):
-        AudioMaterial = draft.AudioMaterial(os.path.join(self.output_dir, 'audioAlg/t0.mp3'))
+        AudioMaterial = self.audioMaterial(os.path.join(self.output_dir, 'audioAlg/t0.mp3'))
         audio_duration = AudioMaterial.duration
         self.script.add_material(AudioMaterial)
         AudioSegment = draft.AudioSegment(AudioMaterial,
@@ -68,10 +282,7 @@ class autoCut():
                                     volume=1)
         self.script.add_segment(AudioSegment, 'TTS')
         self.nowS += audio_duration + 500000
-        titleJson = os.path.join(self.output_dir, 'json/title.json')
-        with open(titleJson, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            title = data.get('title')
+        title = self.loadTitle().get('title')
         segments = [segment for segment in title.split('，') if segment]
         total_length = len(title)
         list = [[segment, round(len(segment) / total_length, 3)] for segment in segments]
@@ -93,7 +304,7 @@ class autoCut():
                     TextSegment.add_animation(TextIntro.金粉飘落, animation_duration)
                     TextSegment.add_animation(TextOutro.渐隐, animation_duration/2)
                     self.script.add_segment(TextSegment, 'T' + str(key))
-        video_material = draft.VideoMaterial(os.path.join(self.bgv_dir, "金粉向右飘.mp4"))
+        video_material = self.videoMaterial(os.path.join(self.bgv_dir, "金粉向右飘.mp4"))
         video_duration = video_material.duration
         self.script.add_material(video_material)
         video_segment = draft.VideoSegment(video_material,
@@ -103,25 +314,22 @@ class autoCut():
         
     
     def addItem(self) -> str:
-        with open(os.path.join(self.output_dir, "json/item.json"), 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
-            json_data = json_data['lists']
+        json_data = self.loadItems()
         for key, item in json_data.items() if isinstance(json_data, dict) else enumerate(json_data):
             # 音频素材
             itemPeiyinNow = self.nowS
             audio_duration = 0
-            for i in range(10):
-                if os.path.exists(os.path.join(self.output_dir, f"audioAlg/{item['peiyin']}{i}.mp3")):
-                    AudioMaterial = draft.AudioMaterial(os.path.join(self.output_dir, f"audioAlg/{item['peiyin']}{i}.mp3"))
-                    audio_length = AudioMaterial.duration
-                    
-                    self.script.add_material(AudioMaterial)
-                    AudioSegment = draft.AudioSegment(AudioMaterial,
-                                    trange(int(itemPeiyinNow), int(audio_length)),
-                                    volume=1)
-                    self.script.add_segment(AudioSegment, 'TTS')
-                    itemPeiyinNow += audio_length
-                    audio_duration+=audio_length
+            for segment_path in self.peiyinSegments(item['peiyin']):
+                AudioMaterial = self.audioMaterial(segment_path)
+                audio_length = AudioMaterial.duration
+                
+                self.script.add_material(AudioMaterial)
+                AudioSegment = draft.AudioSegment(AudioMaterial,
+                                trange(int(itemPeiyinNow), int(audio_length)),
+                                volume=1)
+                self.script.add_segment(AudioSegment, 'TTS')
+                itemPeiyinNow += audio_length
+                audio_duration+=audio_length
             
             # 背景素材,分段定制
             
@@ -217,12 +425,11 @@ class autoCut():
                         TextSegment.add_animation(TextOutro.渐隐, animation_duration/3)
                         self.script.add_segment(TextSegment, 'T' + str(key))
                         indent += 500000
-            print(audio_duration/500000)
             self.nowS += audio_duration + 500000
         return 'Success'
     
     def addVideo(self, filename: str):
-        video_material = draft.VideoMaterial(os.path.join(self.output_dir, filename))
+        video_material = self.videoMaterial(os.path.join(self.output_dir, filename))
         video_duration = video_material.duration
         self.script.add_material(video_material)
         video_segment = draft.VideoSegment(video_material,
@@ -233,18 +440,46 @@ class autoCut():
     def dumpDraft(self):
         self.script.dump(self.DUMP_PATH + '/draft_content.json')
     
-    def general_draft(self):
+    def assemble(self):
+        """第三阶段：使用已解析的素材按顺序组装时间线"""
+        self.addTitle()
+        self.addItem()
+        self.addBgm()
+        # testObj.addVideo('bgv.mp4')
+
+    def export(self):
+        ctrl = draft.JianyingController()
+        ctrl.export_draft("千古词帝李煜的巅峰之作", "C:/Users/Kinso/Desktop/tmp", resolution=ExportResolution.RES_1080P, framerate=ExportFramerate.FR_24)
+
+    def timed(self, phase: str, func, *args):
+        """执行 func 并记录该阶段的耗时"""
+        start = time.perf_counter()
         try:
-            self.addTitle()
-            self.addItem()
-            self.addBgm()
-            # testObj.addVideo('bgv.mp4')
-            self.dumpDraft()
-            # 导出
-            ctrl = draft.JianyingController()
-            ctrl.export_draft("千古词帝李煜的巅峰之作", "C:/Users/Kinso/Desktop/tmp", resolution=ExportResolution.RES_1080P, framerate=ExportFramerate.FR_24)
+            return func(*args)
+        finally:
+            self.timings[phase] = round(time.perf_counter() - start, 3)
+    
+    def general_draft(self) -> dict:
+        """
+        生成草稿并导出
+
+        Returns:
+            {"status": "Success", "timings": 各阶段耗时(秒), "media_cache": 素材缓存统计}
+        """
+        try:
+            # 解析配置，列出所有用到的素材文件
+            files = self.timed('resolve', self.resolveMaterials)
+            # 并发解析所有素材
+            self.timed('probe', self.prefetchMaterials, files)
+            # 组装时间线
+            self.timed('assemble', self.assemble)
+            self.timed('dump', self.dumpDraft)
             # 导出
+            self.timed('export', self.export)
         except Exception as e:
-            print(f"生成草稿时发生错误: {str(e)}")
+            logger.error("生成草稿时发生错误: %s", e)
             raise
-        return 'Success'
+        finally:
+            self.media_cache.save()
+            logger.info("草稿生成各阶段耗时(秒): %s, 素材缓存: %s", self.timings, self.media_cache.stats())
+        return {"status": "Success", "timings": self.timings, "media_cache": self.media_cache.stats()}
@@ -1,29 +1,645 @@
 import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 import dashscope
+from typing import Optional
 from dotenv import load_dotenv
-from dashscope.audio.tts_v2 import VoiceEnrollmentService, SpeechSynthesizer
+from dashscope.audio.tts_v2 import VoiceEnrollmentService, SpeechSynthesizer, SpeechSynthesizerObjectPool, ResultCallback
 from dashscope.audio.tts_v2.speech_synthesizer import json
 load_dotenv()
 
+TARGET_MODEL = "cosyvoice-v1"
+VOICE_ID = "cosyvoice-prefix-4eec46a3b5d8499a8c29c46766452a63"
+# 批量合成时同时使用的合成器会话数
+COSYVOICE_CONCURRENCY = int(os.getenv('COSYVOICE_CONCURRENCY', '4'))
+# 合成结果缓存目录和容量上限(字节)，容量为0时不缓存
+COSYVOICE_CACHE_DIR = os.getenv(
+    'COSYVOICE_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'mcp_collection', 'tts')
+)
+COSYVOICE_CACHE_MAX_BYTES = int(os.getenv('COSYVOICE_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+# 流式合成时长文本按句切分后每段的最大字符数
+COSYVOICE_SEGMENT_CHARS = int(os.getenv('COSYVOICE_SEGMENT_CHARS', '200'))
+# 单段合成的超时秒数
+COSYVOICE_TIMEOUT = 600
+
+# 缓存键锁的数量，远大于并发合成数，不同的键很少落到同一把锁上
+_KEY_LOCK_STRIPES = 64
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# 句子结束位置：中文标点、换行，或后面跟空白的英文标点
+_SENTENCE_END_RE = re.compile(r'(?<=[。！？；…\n])|(?<=[.!?;])(?=\s)')
+
+
+class _DashscopeBackend:
+    """
+    DashScope CosyVoice 合成后端
+
+    通过SDK的 SpeechSynthesizerObjectPool 复用已建立WebSocket连接的合成器，
+    每次合成借出一个合成器，用完后归还(失败时先关闭连接)，避免每句话都重新建立连接。
+    流式合成不经过对象池，见 stream
+    """
+
+    def __init__(self, max_size: int = COSYVOICE_CONCURRENCY):
+        self.max_size = max_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> SpeechSynthesizerObjectPool:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    dashscope.api_key = os.getenv("ALI_KEY")
+                    self._pool = SpeechSynthesizerObjectPool(max_size=self.max_size)
+        return self._pool
+
+    def close(self):
+        """关闭对象池，停止SDK的后台重连线程(非守护线程，不停止时进程无法退出)"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def synthesize(self, text: str, model: str, voice: str) -> bytes:
+        pool = self._get_pool()
+        synthesizer = pool.borrow_synthesizer(model=model, voice=voice)
+        ok = False
+        try:
+            audio = synthesizer.call(text)
+            ok = True
+            return audio
+        finally:
+            self._release(pool, synthesizer, ok)
+
+    def stream(self, text: str, model: str, voice: str, on_data):
+        """
+        通过回调接口合成，每收到一段音频调用一次 on_data(bytes)，合成完成后返回
+
+        对象池中的合成器创建时没有回调，借出后仍以阻塞方式合成并在内存中拼接整段音频，
+        所以流式合成单独创建带回调的合成器，音频只交给 on_data，不在内存中累积。
+        合成结束后SDK会关闭该合成器的连接
+        """
+        dashscope.api_key = os.getenv("ALI_KEY")
+        callback = _StreamCallback(on_data)
+        synthesizer = SpeechSynthesizer(model=model, voice=voice, callback=callback)
+        ok = False
+        try:
+            # 带回调时 call 立即返回，音频在WebSocket线程中回调
+            synthesizer.call(text)
+            if not callback.done.wait(COSYVOICE_TIMEOUT):
+                raise TimeoutError(f"语音合成超时({COSYVOICE_TIMEOUT}秒)")
+            if callback.error is not None:
+                raise Exception(f"语音合成失败: {callback.error}")
+            ok = True
+        finally:
+            if not ok:
+                try:
+                    synthesizer.close()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _release(pool: SpeechSynthesizerObjectPool, synthesizer, ok: bool):
+        """
+        把借出的合成器还给对象池
+
+        合成失败或超时的合成器连接状态未知，先关闭连接再归还，
+        对象池发现连接已断开后会用新建立连接的合成器替换它
+        """
+        if not ok:
+            try:
+                synthesizer.close()
+            except Exception:
+                pass
+        pool.return_synthesizer(synthesizer)
+
+
+class _StreamCallback(ResultCallback):
+    """把SDK回调的音频数据转交给 on_data，并记录完成和错误"""
+
+    def __init__(self, on_data):
+        self._on_data = on_data
+        self.done = threading.Event()
+        self.error = None
+
+    def on_data(self, data: bytes) -> None:
+        if self.error is not None:
+            return
+        try:
+            self._on_data(bytes(data))
+        except Exception as e:
+            # 回调运行在WebSocket线程中，异常交给等待的线程抛出
+            self.error = e
+            self.done.set()
+
+    def on_error(self, message) -> None:
+        self.error = message
+
+    def on_close(self) -> None:
+        # 任务成功(on_complete)或失败(on_error)后SDK都会调用on_close，
+        # 此时本次任务的回调已经全部结束
+        self.done.set()
+
+
+class FakeBackend:
+    """
+    本地假后端，不访问网络
+
+    按文本生成确定的字节，并模拟建立会话和合成的耗时，用于测试和基准
+    """
+
+    def __init__(self, setup_latency: float = 0.2, latency: float = 0.05, chunk_latency: float = 0.002):
+        """
+        Args:
+            setup_latency: 新建一个会话的耗时(秒)
+            latency: 每次合成的耗时(秒)，流式合成时为首包的耗时
+            chunk_latency: 流式合成时后续每个数据块的间隔(秒)
+        """
+        self.setup_latency = setup_latency
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self._idle = []
+        self._lock = threading.Lock()
+        self.sessions_created = 0
+        self.calls = 0
+
+    def synthesize(self, text: str, model: str, voice: str) -> bytes:
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+            self.calls += 1
+        if session is None:
+            time.sleep(self.setup_latency)
+            with self._lock:
+                self.sessions_created += 1
+                session = self.sessions_created
+        time.sleep(self.latency)
+        audio = FakeBackend.audio_for(text, model, voice)
+        with self._lock:
+            self._idle.append(session)
+        return audio
+
+    def stream(self, text: str, model: str, voice: str, on_data):
+        audio = FakeBackend.audio_for(text, model, voice)
+        time.sleep(self.latency)
+        for i in range(0, len(audio), 1024):
+            if i:
+                time.sleep(self.chunk_latency)
+            on_data(audio[i:i + 1024])
+        with self._lock:
+            self.calls += 1
+
+    def close(self):
+        with self._lock:
+            self._idle = []
+
+    @staticmethod
+    def audio_for(text: str, model: str, voice: str) -> bytes:
+        """按文本生成确定的假音频，长度随文本长度增长"""
+        digest = hashlib.sha256(f'{model}|{voice}|{text}'.encode('utf-8')).digest()
+        return digest * (64 + len(text))
+
+
+class _AudioCache:
+    """
+    按内容寻址的合成音频磁盘缓存
+
+    键为 (模型, 音色, 规范化后的文本) 的哈希，音频文件保存在缓存目录中，
+    sqlite记录每个文件的大小和最近使用时间，总大小超过上限时按LRU淘汰。
+    命中时把缓存文件硬链接到输出路径，跨文件系统等无法链接时复制
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        # 同一个键同时只合成一次；按键的哈希分配到固定数量的锁上，锁的数量不随键增长
+        self._key_locks = [threading.Lock() for _ in range(_KEY_LOCK_STRIPES)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.linked = 0
+        self.copied = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(text: str, model: str, voice: str) -> str:
+        """规范化文本(NFKC、合并空白)后计算缓存键"""
+        normalized = _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+        return hashlib.sha256(f'{model}\0{voice}\0{normalized}'.encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, last_used REAL)'
+            )
+        return self._conn
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.audio')
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        return self._key_locks[int(key[:8], 16) % len(self._key_locks)]
+
+    def lookup(self, key: str, count: bool = False) -> Optional[str]:
+        """
+        返回缓存文件路径并更新最近使用时间，没有缓存时返回None
+
+        count 为True时把本次查找计入命中/未命中统计
+        """
+        path = self._path(key)
+        found = None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None and os.path.exists(path):
+                conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+                conn.commit()
+                found = path
+            elif row is not None:
+                # 缓存文件已被外部删除
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                conn.commit()
+        if count:
+            self._count('hits' if found is not None else 'misses')
+        return found
+
+    def get_or_synthesize(self, text: str, model: str, voice: str, synthesize) -> tuple:
+        """
+        返回 (缓存文件路径, 是否命中)，没有缓存时调用 synthesize() 合成并写入缓存
+        """
+        key = self.make_key(text, model, voice)
+        with self._key_lock(key):
+            path = self.lookup(key, count=True)
+            if path is not None:
+                return path, True
+            audio = synthesize()
+            if audio is None:
+                raise Exception("Geneal audio faild")
+            return self.put(key, audio), False
+
+    def put(self, key: str, audio: bytes) -> str:
+        """写入缓存文件(临时文件+原子替换)并按容量淘汰，返回缓存文件路径"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)',
+                         (key, len(audio), time.time()))
+            conn.commit()
+            self._evict(conn, keep=key)
+        return path
+
+    def _evict(self, conn, keep: str):
+        """按最近使用时间淘汰，直到总大小不超过上限"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_used').fetchall():
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            self.evictions += 1
+        conn.commit()
+
+    def put_file(self, key: str, path: str):
+        """把已生成的音频文件加入缓存：优先硬链接，失败时复制"""
+        cache_path = self._path(key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.materialize(path, cache_path, count=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)',
+                         (key, os.path.getsize(cache_path), time.time()))
+            conn.commit()
+            self._evict(conn, keep=key)
+
+    def materialize(self, cache_path: str, out_path: str, count: bool = True):
+        """
+        把缓存文件放到输出路径：优先硬链接，失败时复制
+
+        通过临时文件再原子替换，已存在的输出文件不会被原地改写，
+        因此也不会改动与之硬链接的缓存文件
+        """
+        out_dir = os.path.dirname(os.path.abspath(out_path))
+        tmp_path = os.path.join(out_dir, f'.{os.path.basename(out_path)}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            try:
+                os.link(cache_path, tmp_path)
+                linked = True
+            except OSError:
+                shutil.copyfile(cache_path, tmp_path)
+                linked = False
+            os.replace(tmp_path, out_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if count:
+            self._count('linked' if linked else 'copied')
+
+    def stats(self) -> dict:
+        with self._lock:
+            row = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            return {
+                "directory": self.directory,
+                "entries": row[0],
+                "bytes": row[1],
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "linked": self.linked,
+                "copied": self.copied
+            }
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+class _OrderedWriter:
+    """
+    把并发合成的多段音频按顺序写入同一个文件
+
+    当前段的数据到达后直接写入，后面的段先缓存在内存中，
+    前一段完成后再依次写出
+    """
+
+    def __init__(self, f, segments: int, start: float = None):
+        """start 为请求开始的 time.perf_counter()，首字节耗时从这里算起"""
+        self._f = f
+        self._buffers = [[] for _ in range(segments)]
+        self._finished = [False] * segments
+        self._current = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter() if start is None else start
+        self.first_byte = None
+        self.bytes = 0
+
+    def feed(self, index: int, data: bytes):
+        with self._lock:
+            if index == self._current:
+                self._write(data)
+            else:
+                self._buffers[index].append(data)
+
+    def finish(self, index: int):
+        with self._lock:
+            self._finished[index] = True
+            while self._current < len(self._finished) and self._finished[self._current]:
+                self._current += 1
+                if self._current < len(self._buffers):
+                    for data in self._buffers[self._current]:
+                        self._write(data)
+                    self._buffers[self._current] = []
+
+    def _write(self, data: bytes):
+        if not data:
+            return
+        if self.first_byte is None:
+            self.first_byte = time.perf_counter() - self._start
+        self._f.write(data)
+        # 及时刷到文件，读取方可以边合成边读取临时文件
+        self._f.flush()
+        self.bytes += len(data)
+
+
+def _split_sentences(text: str, max_chars: int) -> list:
+    """按句子边界把长文本切分为不超过 max_chars 字符的段，单句超长时单独成段"""
+    segments = []
+    current = ''
+    for sentence in _SENTENCE_END_RE.split(text):
+        if not sentence.strip():
+            current += sentence
+            continue
+        if current.strip() and len(current) + len(sentence) > max_chars:
+            segments.append(current)
+            current = ''
+        current += sentence
+    if current.strip():
+        segments.append(current)
+    return segments or [text]
+
+
+_audio_cache = _AudioCache(COSYVOICE_CACHE_DIR, COSYVOICE_CACHE_MAX_BYTES)
+_backend = FakeBackend() if os.getenv('COSYVOICE_BACKEND') == 'fake' else _DashscopeBackend()
+
+
 class Cosyvoice:
-    
+
+    @staticmethod
+    def set_backend(backend):
+        """
+        替换合成后端，backend需要提供 synthesize(text, model, voice) -> bytes
+
+        设置环境变量 COSYVOICE_BACKEND=fake 时默认使用 FakeBackend
+        """
+        global _backend
+        _backend = backend
+
+    @staticmethod
+    def shutdown():
+        """释放合成后端持有的连接和后台线程，服务退出前调用"""
+        close = getattr(_backend, 'close', None)
+        if close is not None:
+            close()
+
     @staticmethod
     def generate_audio(text: str = "", out_path: str = "") -> str:
-        dashscope.api_key = os.getenv("ALI_KEY")
-        target_model = "cosyvoice-v1"
-        voice_id = "cosyvoice-prefix-4eec46a3b5d8499a8c29c46766452a63"
-        synthesizer = SpeechSynthesizer(model=target_model, voice=voice_id)
-        audio_result = synthesizer.call(str(text))
-        try:
-            with open(out_path, "wb") as f:
-                if audio_result is not None:
-                    f.write(audio_result)
-                else:
-                    raise Exception("Geneal audio faild")
+        try:
+            Cosyvoice._synthesize_to(str(text), out_path)
             return "Success"
         except Exception as e:
             return "Failed"
 
+    @staticmethod
+    def _synthesize_to(text: str, out_path: str) -> dict:
+        """合成文本并写入输出路径，启用缓存时先查缓存，返回 {"bytes", "cached"}"""
+        if _audio_cache.enabled:
+            cache_path, cached = _audio_cache.get_or_synthesize(
+                text, TARGET_MODEL, VOICE_ID, lambda: _backend.synthesize(text, TARGET_MODEL, VOICE_ID))
+            _audio_cache.materialize(cache_path, out_path)
+            return {"bytes": os.path.getsize(out_path), "cached": cached}
+
+        audio = _backend.synthesize(text, TARGET_MODEL, VOICE_ID)
+        if audio is None:
+            raise Exception("Geneal audio faild")
+        with open(out_path, "wb") as f:
+            f.write(audio)
+        return {"bytes": len(audio), "cached": False}
+
+    @staticmethod
+    def generate_audio_stream(text: str, out_path: str, segment_chars: int = COSYVOICE_SEGMENT_CHARS,
+                              max_workers: int = COSYVOICE_CONCURRENCY) -> dict:
+        """
+        流式合成音频，边合成边写入文件
+
+        长文本按句子切分为多段并发合成，各段按顺序写入同一个临时文件，
+        全部完成后原子重命名为 out_path。各段直接按字节拼接，适用于默认的mp3格式
+
+        Args:
+            text: 要合成的文本
+            out_path: 输出音频文件路径
+            segment_chars: 每段的最大字符数
+            max_workers: 同时合成的段数
+
+        Returns:
+            {"status", "out_path", "bytes", "segments", "cached", "first_byte_seconds", "seconds", "error"}
+        """
+        text = str(text)
+        start = time.perf_counter()
+        result = {"status": "Success", "out_path": out_path, "segments": 0, "cached": False}
+        key = _audio_cache.make_key(text, TARGET_MODEL, VOICE_ID) if _audio_cache.enabled else None
+        try:
+            cache_path = _audio_cache.lookup(key, count=True) if key else None
+            if cache_path is not None:
+                _audio_cache.materialize(cache_path, out_path)
+                result.update(bytes=os.path.getsize(out_path), cached=True,
+                              first_byte_seconds=round(time.perf_counter() - start, 3))
+            else:
+                segments = _split_sentences(text, max(1, segment_chars))
+                result["segments"] = len(segments)
+                writer = Cosyvoice._stream_segments(segments, out_path, max_workers, start)
+                result.update(bytes=writer.bytes, first_byte_seconds=round(writer.first_byte or 0.0, 3))
+                if key:
+                    _audio_cache.put_file(key, out_path)
+        except Exception as e:
+            result["status"] = "Failed"
+            result["error"] = str(e)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    @staticmethod
+    def _stream_segments(segments: list, out_path: str, max_workers: int, start: float = None) -> _OrderedWriter:
+        """并发流式合成各段并按顺序写入临时文件，成功后原子重命名为 out_path"""
+        out_dir = os.path.dirname(os.path.abspath(out_path))
+        fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=f'.{os.path.basename(out_path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer = _OrderedWriter(f, len(segments), start)
+
+                def stream_one(index):
+                    _backend.stream(segments[index], TARGET_MODEL, VOICE_ID,
+                                    lambda data: writer.feed(index, data))
+                    writer.finish(index)
+
+                with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(segments)))) as pool:
+                    # 任一段失败时抛出异常，整个文件作废
+                    list(pool.map(stream_one, range(len(segments))))
+                if not writer.bytes:
+                    raise Exception("Geneal audio faild")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, out_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return writer
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """返回合成音频缓存的统计"""
+        return _audio_cache.stats()
+
+    @staticmethod
+    def prewarm_cache(texts: list, max_workers: int = COSYVOICE_CONCURRENCY) -> dict:
+        """
+        预先合成一批文本写入缓存，已缓存的文本跳过
+
+        Returns:
+            {"cached": 已在缓存中的数量, "synthesized": 新合成的数量, "failed": 失败数量, "errors": 失败的文本和原因}
+        """
+        if not _audio_cache.enabled:
+            raise ValueError("合成音频缓存未启用(COSYVOICE_CACHE_MAX_BYTES为0)")
+
+        def prewarm_one(text):
+            text = str(text)
+            try:
+                _, cached = _audio_cache.get_or_synthesize(
+                    text, TARGET_MODEL, VOICE_ID, lambda: _backend.synthesize(text, TARGET_MODEL, VOICE_ID))
+                return ("cached" if cached else "synthesized"), None
+            except Exception as e:
+                return "failed", str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(texts) or 1))) as pool:
+            outcomes = list(pool.map(prewarm_one, texts))
+        result = {"cached": 0, "synthesized": 0, "failed": 0, "errors": []}
+        for text, (status, error) in zip(texts, outcomes):
+            result[status] += 1
+            if error is not None:
+                result["errors"].append({"text": text, "error": error})
+        return result
+
+    @staticmethod
+    def generate_audio_batch(items: list, max_workers: int = COSYVOICE_CONCURRENCY) -> dict:
+        """
+        批量合成音频，多句话在有限数量的合成器会话上并发合成
+
+        Args:
+            items: 待合成的列表，每项为 {"text": 文本, "out_path": 输出路径} 或 [文本, 输出路径]
+            max_workers: 同时合成的数量
+
+        Returns:
+            {"succeeded": 成功数, "failed": 失败数, "seconds": 总耗时,
+             "items": [{"out_path", "status", "seconds", "bytes", "cached", "error"}]}，items与输入顺序一致
+        """
+        def synthesize_one(item):
+            if isinstance(item, dict):
+                text, out_path = item.get("text", ""), item.get("out_path", "")
+            else:
+                text, out_path = item
+            start = time.perf_counter()
+            result = {"out_path": out_path, "status": "Success"}
+            try:
+                result.update(Cosyvoice._synthesize_to(str(text), out_path))
+            except Exception as e:
+                result["status"] = "Failed"
+                result["error"] = str(e)
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            return result
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items) or 1))) as pool:
+            results = list(pool.map(synthesize_one, items))
+        succeeded = sum(1 for result in results if result["status"] == "Success")
+        return {
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "seconds": round(time.perf_counter() - start, 3),
+            "items": results
+        }
+
 if __name__ == "__main__":
     # 测试 generate_audio 方法
     test_text = "这是一段测试文本。"
@@ -32,3 +648,13 @@ if __name__ == "__main__":
     print(f"音频生成结果: {result}")
     if result == "Success":
         print(f"音频已保存至: {output_path}")
+
+    # 使用本地假后端测试批量合成：20句话只建立 COSYVOICE_CONCURRENCY 个会话
+    import tempfile
+    fake = FakeBackend()
+    Cosyvoice.set_backend(fake)
+    with tempfile.TemporaryDirectory() as tmp:
+        batch = Cosyvoice.generate_audio_batch(
+            [{"text": f"第{i}句", "out_path": os.path.join(tmp, f"peiyin{i}.mp3")} for i in range(20)])
+    print(f"批量合成: 成功 {batch['succeeded']} 失败 {batch['failed']} 耗时 {batch['seconds']}s "
+          f"新建会话 {fake.sessions_created}")
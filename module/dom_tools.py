@@ -1,20 +1,145 @@
 import json
-import requests
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pyquery import PyQuery as pq
+from module.http_client import get_http_client
+
+
+class _DocumentCache:
+    """
+    进程内共享的已解析文档缓存
+
+    URL按TTL缓存，过期后带 If-None-Match / If-Modified-Since 重新验证，
+    内联HTML按内容哈希缓存。按条目数和近似字节数做LRU淘汰
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def get_url(self, url: str):
+        """获取URL对应的文档，缓存过期时做条件请求"""
+        key = 'url:' + url
+        entry = self._get(key)
+        if entry is not None and time.monotonic() - entry['fetched_at'] < self.ttl:
+            self._count('hits')
+            return entry['doc']
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = get_http_client().get(url, headers=headers)
+        if entry is not None and headers and response.status_code == 304:
+            with self._lock:
+                entry['fetched_at'] = time.monotonic()
+                self.revalidated += 1
+                self.hits += 1
+            return entry['doc']
+
+        response.raise_for_status()
+        # 尝试检测响应的编码
+        response.encoding = response.apparent_encoding or 'utf-8'
+        html_content = response.text
+        doc = pq(html_content)
+        self._count('misses')
+        self._put(key, doc, len(response.content),
+                  response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return doc
+
+    def get_html(self, html: str):
+        """获取内联HTML对应的文档，按内容哈希缓存"""
+        key = 'html:' + hashlib.blake2b(html.encode('utf-8'), digest_size=16).hexdigest()
+        entry = self._get(key)
+        if entry is not None:
+            self._count('hits')
+            return entry['doc']
+        doc = pq(html)
+        self._count('misses')
+        self._put(key, doc, len(html))
+        return doc
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions
+            }
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.revalidated = self.evictions = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, doc, size: int, etag: str = None, last_modified: str = None):
+        # 解析后的DOM树通常比源码大几倍，这里只按源码大小近似估计
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old['size']
+            if size > self.max_bytes:
+                return
+            self._entries[key] = {
+                'doc': doc,
+                'size': size,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.monotonic()
+            }
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['size']
+                self.evictions += 1
+
+
+_document_cache = _DocumentCache()
 
 
 class DomTools:
     def __init__(self, html: str):
         # 检查是否为 HTTP/HTTPS 链接
         if html.startswith(('http://', 'https://')):
-            response = requests.get(html)
-            response.raise_for_status()
-            # 尝试检测响应的编码
-            response.encoding = response.apparent_encoding or 'utf-8'
-            html_content = response.text
-            self.doc = pq(html_content)
+            self.doc = _document_cache.get_url(html)
         else:
-            self.doc = pq(html)
+            self.doc = _document_cache.get_html(html)
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """返回已解析文档缓存的命中统计"""
+        return _document_cache.stats()
 
     def get_text(self, dateSelector: str, descSelector: str = None, versionSelector: str = None) -> str:
         date_html = str(self.doc(dateSelector).html() or '')
@@ -32,9 +157,76 @@ class DomTools:
             }
         return json.dumps(result, ensure_ascii=False)
 
+    def extract(self, selectors: dict) -> dict:
+        """
+        在同一棵已解析的文档树上一次性提取多个字段
+
+        Args:
+            selectors: 字段名到选择器的映射，值可以是CSS选择器字符串(等价于
+                {"selector": 选择器, "mode": "html"})，也可以是字典：
+                {
+                    "selector": "CSS选择器",
+                    "mode": "text" | "html" | "attr"，默认 "html",
+                    "attr": "属性名(mode为attr时必填)",
+                    "all": 是否返回所有匹配项的列表，默认只取第一个
+                }
+
+        Returns:
+            字段名到提取结果的字典，单个匹配为字符串，all为True时为字符串列表
+        """
+        result = {}
+        for name, spec in selectors.items():
+            if isinstance(spec, str):
+                spec = {"selector": spec}
+            mode = spec.get("mode", "html")
+            if mode not in ("text", "html", "attr"):
+                raise ValueError(f"字段 {name} 的mode无效: {mode}")
+            if mode == "attr" and not spec.get("attr"):
+                raise ValueError(f"字段 {name} 使用attr模式时必须指定attr")
+
+            matches = self.doc(spec["selector"])
+            if spec.get("all"):
+                result[name] = [DomTools._extract_value(item, mode, spec.get("attr")) for item in matches.items()]
+            else:
+                result[name] = DomTools._extract_value(matches.eq(0), mode, spec.get("attr")) if matches else ''
+        return result
+
+    @staticmethod
+    def _extract_value(item, mode: str, attr: str = None) -> str:
+        """按模式提取单个匹配元素的内容"""
+        if mode == "text":
+            return item.text() or ''
+        if mode == "attr":
+            return str(item.attr(attr) or '')
+        return str(item.html() or '')
+
+    @staticmethod
+    def extract_urls(urls: list, selectors: dict, max_workers: int = 8) -> dict:
+        """
+        并发获取多个URL，并对每个页面执行同一组选择器
+
+        Args:
+            urls: URL列表
+            selectors: 同 extract 的 selectors
+            max_workers: 并发获取的线程数
+
+        Returns:
+            URL到提取结果的字典，单个URL失败时结果为 {"error": "错误信息"}
+        """
+        def extract_one(url):
+            try:
+                return DomTools(url).extract(selectors)
+            except Exception as e:
+                return {"error": f"提取失败: {str(e)}"}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls) or 1))) as pool:
+            return dict(zip(urls, pool.map(extract_one, urls)))
+
 if __name__ == '__main__':
     html = 'https://docs.jiguang.cn/jpush/jpush_changelog/updates_iOS'
     dom = DomTools(html)
     print(dom.get_text('h1'))
     print(dom.get_text('h1', 'p'))
-    print(dom.get_text('h1', 'p', 'h2'))
\ No newline at end of file
+    print(dom.get_text('h1', 'p', 'h2'))
+    print(dom.extract({'title': {'selector': 'h1', 'mode': 'text'}, 'links': {'selector': 'a', 'mode': 'attr', 'attr': 'href', 'all': True}}))
+    print(DomTools.cache_stats())
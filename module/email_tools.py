@@ -2,14 +2,319 @@ import imaplib
 import email
 from email.header import decode_header
 import ssl
-from typing import Optional
+import time
+import hashlib
+import threading
+import re
+import os
+import base64
+import sqlite3
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional, Callable, Any
+from pyquery import PyQuery as pq
+
+# 按主题查找时每批获取的邮件头数量
+HEADER_FETCH_CHUNK = 50
+# 增量同步时每批下载的邮件数量
+SYNC_FETCH_CHUNK = 50
+# 本地邮件索引的sqlite文件路径
+EMAIL_INDEX_PATH = os.getenv(
+    'EMAIL_INDEX_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'mcp_collection', 'email_index.sqlite3')
+)
+
+_UID_RE = re.compile(rb'UID (\d+)')
+_DATE_ONLY_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+_TAG_RE = re.compile(r'<[^>]+>')
+_IMAP_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+class _ImapPool:
+    """
+    IMAP连接池，按 (服务器, 端口, 账号) 复用已登录的连接
+
+    IMAP连接是有状态的(当前选中的邮箱等)，同一时间一个连接只借给一个调用方使用。
+    借出前对空闲超过 keepalive 秒的连接发送NOOP检查是否仍然可用，
+    空闲超过 idle_timeout 秒的连接直接关闭；复用的连接在使用中断开时自动重连重试一次
+    """
+
+    def __init__(self, max_per_key: int = 4, keepalive: float = 60, idle_timeout: float = 600,
+                 timeout: float = 30, connect: Callable[[str, int, float], Any] = None):
+        """
+        Args:
+            max_per_key: 每个账号最多保留的空闲连接数
+            keepalive: 空闲超过该秒数的连接在复用前先发送NOOP检查
+            idle_timeout: 空闲超过该秒数的连接直接关闭
+            timeout: 连接的socket超时秒数
+            connect: 创建连接的函数 (服务器, 端口, 超时) -> IMAP4对象，可替换为本地测试服务的连接方式
+        """
+        self.max_per_key = max_per_key
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._connect = connect or _ImapPool._default_connect
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.reconnects = 0
+
+    @staticmethod
+    def _default_connect(imap_server: str, port: int, timeout: float):
+        if port == 993:
+            # SSL连接
+            return imaplib.IMAP4_SSL(imap_server, port, timeout=timeout)
+        # 普通连接，需要STARTTLS
+        mail = imaplib.IMAP4(imap_server, port, timeout=timeout)
+        mail.starttls()
+        return mail
+
+    def run(self, imap_server: str, port: int, email_address: str, password: str, func: Callable):
+        """
+        借出一个已登录的连接执行 func(mail)，执行完成后归还连接
+        """
+        key = (imap_server, port, email_address)
+        # 只保存密码摘要，用于避免用错误的密码复用他人已登录的连接
+        secret = hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+        mail = self._checkout(key, secret)
+        if mail is not None:
+            try:
+                result = func(mail)
+            except (imaplib.IMAP4.abort, OSError):
+                # 复用的连接可能已被服务端断开，换一个新连接重试
+                self._close(mail)
+                self._count('reconnects')
+            except imaplib.IMAP4.error:
+                # 命令被拒绝(如邮箱不存在)不影响连接本身
+                self._checkin(key, secret, mail)
+                raise
+            except BaseException:
+                self._close(mail)
+                raise
+            else:
+                self._checkin(key, secret, mail)
+                return result
+
+        mail = self._connect(imap_server, port, self.timeout)
+        try:
+            # 登录邮箱
+            mail.login(email_address, password)
+            self._count('created')
+            result = func(mail)
+        except imaplib.IMAP4.abort:
+            self._close(mail)
+            raise
+        except imaplib.IMAP4.error:
+            # 登录失败的连接不能复用，登录后命令被拒绝的连接可以归还
+            if mail.state in ('AUTH', 'SELECTED'):
+                self._checkin(key, secret, mail)
+            else:
+                self._close(mail)
+            raise
+        except BaseException:
+            self._close(mail)
+            raise
+        self._checkin(key, secret, mail)
+        return result
+
+    def _checkout(self, key: tuple, secret: str):
+        """取出一个可用的空闲连接，没有时返回None"""
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                # 密码不一致的连接保留在池中，不借给本次调用
+                conns = self._idle.get(key, [])
+                matched = [i for i, entry in enumerate(conns) if entry[1] == secret]
+                if not matched:
+                    return None
+                mail, _, last_used = conns.pop(matched[-1])
+            if now - last_used > self.idle_timeout:
+                self._close(mail)
+                continue
+            if now - last_used > self.keepalive:
+                try:
+                    mail.noop()
+                except Exception:
+                    self._close(mail)
+                    continue
+            self._count('reused')
+            return mail
+
+    def _checkin(self, key: tuple, secret: str, mail):
+        """归还连接，超出数量上限或空闲过久的连接被关闭"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            conns.append((mail, secret, now))
+            while len(conns) > self.max_per_key:
+                expired.append(conns.pop(0)[0])
+            for other in self._idle.values():
+                while other and now - other[0][2] > self.idle_timeout:
+                    expired.append(other.pop(0)[0])
+        for old in expired:
+            self._close(old)
+
+    @staticmethod
+    def _close(mail):
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "idle_connections": sum(len(conns) for conns in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+                "reconnects": self.reconnects
+            }
+
+    def _count(self, name: str):
+        # 连接在多个线程中借出和归还，计数需要在锁内更新
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def clear(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            conns = [mail for entries in self._idle.values() for mail, _, _ in entries]
+            self._idle.clear()
+        for mail in conns:
+            self._close(mail)
+
+
+class _EmailIndex:
+    """
+    邮箱的本地sqlite索引
+
+    按 (账号, 邮箱) 保存 UIDVALIDITY、UIDNEXT、HIGHESTMODSEQ 和已同步的最大UID，
+    以及每封邮件解析后的主题、发件人、日期和正文。UIDVALIDITY 变化时
+    该邮箱的索引全部作废重建
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS mailboxes ('
+                'account TEXT, mailbox TEXT, uidvalidity INTEGER, uidnext INTEGER, highestmodseq INTEGER, '
+                'last_uid INTEGER, synced_at REAL, PRIMARY KEY (account, mailbox))'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS messages ('
+                'account TEXT, mailbox TEXT, uid INTEGER, subject TEXT, sender TEXT, date TEXT, '
+                'timestamp REAL, body TEXT, PRIMARY KEY (account, mailbox, uid))'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (account, mailbox, timestamp)'
+            )
+        return self._conn
+
+    def get_state(self, account: str, mailbox: str) -> Optional[dict]:
+        """返回邮箱的同步状态，没有时返回None"""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT uidvalidity, uidnext, highestmodseq, last_uid, '
+                '(SELECT COUNT(*) FROM messages WHERE account = ? AND mailbox = ?) '
+                'FROM mailboxes WHERE account = ? AND mailbox = ?',
+                (account, mailbox, account, mailbox)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "uidvalidity": row[0],
+            "uidnext": row[1],
+            "highestmodseq": row[2],
+            "last_uid": row[3],
+            "count": row[4]
+        }
+
+    def save_state(self, account: str, mailbox: str, uidvalidity: int, uidnext: int,
+                   highestmodseq: int, last_uid: int):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO mailboxes '
+                '(account, mailbox, uidvalidity, uidnext, highestmodseq, last_uid, synced_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (account, mailbox, uidvalidity, uidnext, highestmodseq, last_uid, time.time())
+            )
+            conn.commit()
+
+    def reset(self, account: str, mailbox: str):
+        """删除邮箱的同步状态和所有已索引的邮件"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM messages WHERE account = ? AND mailbox = ?', (account, mailbox))
+            conn.execute('DELETE FROM mailboxes WHERE account = ? AND mailbox = ?', (account, mailbox))
+            conn.commit()
+
+    def add_messages(self, account: str, mailbox: str, rows: list):
+        """rows 为 (uid, subject, sender, date, timestamp, body) 的列表"""
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                'INSERT OR REPLACE INTO messages (account, mailbox, uid, subject, sender, date, timestamp, body) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(account, mailbox) + tuple(row) for row in rows]
+            )
+            conn.commit()
+
+    def prune(self, account: str, mailbox: str, keep_uids: set) -> int:
+        """删除服务端已不存在的邮件，返回删除的数量"""
+        with self._lock:
+            conn = self._connect()
+            stored = [row[0] for row in conn.execute(
+                'SELECT uid FROM messages WHERE account = ? AND mailbox = ?', (account, mailbox)
+            )]
+            removed = [(account, mailbox, uid) for uid in stored if uid not in keep_uids]
+            conn.executemany('DELETE FROM messages WHERE account = ? AND mailbox = ? AND uid = ?', removed)
+            conn.commit()
+        return len(removed)
+
+    def query(self, account: str, mailbox: str, subject: str = None, since: float = None,
+              limit: int = 20) -> list:
+        """按主题关键词和起始时间查询，结果按UID从新到旧排列"""
+        sql = 'SELECT uid, subject, sender, date, body FROM messages WHERE account = ? AND mailbox = ?'
+        params = [account, mailbox]
+        if subject:
+            escaped = subject.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            sql += " AND subject LIKE ? ESCAPE '\\'"
+            params.append(f'%{escaped}%')
+        if since is not None:
+            sql += ' AND timestamp >= ?'
+            params.append(since)
+        sql += ' ORDER BY uid DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [
+            {"uid": uid, "subject": subject_str, "from": sender, "date": date, "body": body}
+            for uid, subject_str, sender, date, body in rows
+        ]
+
+
+_imap_pool = _ImapPool()
+_email_index = _EmailIndex(EMAIL_INDEX_PATH)
 
 
 class EmailTools:
     """邮件处理类，提供邮件读取功能"""
     
     @staticmethod
-    def getLastEmail(imap_server: str, port: int, email_address: str, password: str, inbox: str, subject: str) -> Optional[str]:
+    def getLastEmail(imap_server: str, port: int, email_address: str, password: str, inbox: str, subject: str,
+                     incremental: bool = False, html_to_text: bool = False) -> Optional[str]:
         """
         获取指定主题的最后一封邮件内容
         
@@ -19,127 +324,502 @@ class EmailTools:
             email_address: 邮箱地址
             password: 邮箱密码
             subject: 要搜索的邮件主题
+            incremental: 是否先增量同步到本地索引，再从索引中查找
+            html_to_text: 是否把HTML正文转换为纯文本
             
         Returns:
             邮件内容字符串，如果未找到返回None
         """
         try:
-            # 创建IMAP连接
-            if port == 993:
-                # SSL连接
-                mail = imaplib.IMAP4_SSL(imap_server, port)
-            else:
-                # 普通连接，需要STARTTLS
-                mail = imaplib.IMAP4(imap_server, port)
-                mail.starttls()
-            
-            # 登录邮箱
-            mail.login(email_address, password)
-            
-            # 选择收件箱
-            mail.select(inbox)
-            print(f"邮件主题");
-            # 搜索所有邮件
-            status, messages = mail.search(None, 'ALL')
-            
+            if incremental:
+                result = EmailTools.searchIndexedEmails(imap_server, port, email_address, password, inbox,
+                                                        subject=subject, limit=1)
+                if not result["emails"]:
+                    return None
+                body = result["emails"][0]["body"]
+                # 索引中保存的是原始正文，只有HTML正文需要转换
+                if html_to_text and body.lstrip().startswith('<'):
+                    body = EmailTools._html_to_text(body)
+                return body
+            return _imap_pool.run(imap_server, port, email_address, password,
+                                  lambda mail: EmailTools._find_last_email(mail, inbox, subject, html_to_text))
+        except Exception as e:
+            print(f"获取邮件时出错: {str(e)}")
+            return None
+
+    @staticmethod
+    def syncMailbox(imap_server: str, port: int, email_address: str, password: str, inbox: str) -> dict:
+        """
+        把邮箱增量同步到本地索引，只下载上次同步之后新到达的邮件
+
+        Returns:
+            同步结果，包含是否无变化、新增和删除的邮件数量
+        """
+        account = EmailTools._account_key(imap_server, port, email_address)
+        return _imap_pool.run(imap_server, port, email_address, password,
+                              lambda mail: EmailTools._sync(mail, account, inbox))
+
+    @staticmethod
+    def searchIndexedEmails(imap_server: str, port: int, email_address: str, password: str, inbox: str,
+                            subject: str = None, since: str = None, limit: int = 20) -> dict:
+        """
+        增量同步邮箱后从本地索引查询邮件
+
+        Args:
+            subject: 主题关键词，为空时不按主题过滤
+            since: 起始时间，格式为 YYYY-MM-DD 或 ISO 8601 时间
+            limit: 最多返回的邮件数量
+
+        Returns:
+            {"sync": 同步结果, "emails": 按到达时间从新到旧排列的邮件列表}
+        """
+        since_ts = EmailTools._parse_since(since) if since else None
+        sync = EmailTools.syncMailbox(imap_server, port, email_address, password, inbox)
+        account = EmailTools._account_key(imap_server, port, email_address)
+        emails = _email_index.query(account, inbox, subject, since_ts, limit)
+        return {"sync": sync, "emails": emails}
+
+    @staticmethod
+    def getLastEmails(imap_server: str, port: int, email_address: str, password: str, inbox: str,
+                      subject: str = None, sender: str = None, since: str = None, limit: int = 10,
+                      include_attachments: bool = False) -> list:
+        """
+        获取最近N封符合条件的邮件，返回结构化的字段
+
+        Args:
+            subject: 主题关键词，为空时不按主题过滤
+            sender: 发件人关键词，为空时不按发件人过滤
+            since: 起始时间，格式为 YYYY-MM-DD 或 ISO 8601 时间
+            limit: 最多返回的邮件数量
+            include_attachments: 是否返回附件内容(base64)，默认只返回附件的元数据
+
+        Returns:
+            按到达时间从新到旧排列的邮件列表，每封邮件包含
+            uid/from/to/date/subject/text/html/attachments
+        """
+        since_ts = EmailTools._parse_since(since) if since else None
+        return _imap_pool.run(imap_server, port, email_address, password,
+                              lambda mail: EmailTools._fetch_last_emails(
+                                  mail, inbox, subject, sender, since_ts, limit, include_attachments))
+
+    @staticmethod
+    def _fetch_last_emails(mail, inbox: str, subject: str, sender: str, since_ts: float, limit: int,
+                           include_attachments: bool) -> list:
+        """在已登录的连接上获取最近N封符合条件的邮件"""
+        status, _ = mail.select(inbox, readonly=True)
+        if status != 'OK' or limit <= 0:
+            return []
+
+        extra = ()
+        if sender and sender.isascii():
+            extra += ('FROM', '"' + sender.replace('\\', '\\\\').replace('"', '\\"') + '"')
+        if since_ts is not None:
+            # IMAP的SINCE只精确到天，且月份固定使用英文缩写
+            day = datetime.fromtimestamp(since_ts)
+            extra += ('SINCE', f'{day.day:02d}-{_IMAP_MONTHS[day.month - 1]}-{day.year}')
+        uids = EmailTools._search_subject(mail, subject, extra)
+
+        # 从最新的邮件开始，分批只获取邮件头，在客户端确认所有条件
+        uids.reverse()
+        if not (subject or sender or since_ts is not None):
+            # 没有过滤条件时直接取最新的N封
+            uids, matched = [], uids[:limit]
+        else:
+            matched = []
+        for i in range(0, len(uids), HEADER_FETCH_CHUNK):
+            if len(matched) >= limit:
+                break
+            chunk = uids[i:i + HEADER_FETCH_CHUNK]
+            status, data = mail.uid('FETCH', b','.join(chunk), '(BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)])')
             if status != 'OK':
-                return None
-            
-            # 获取邮件ID列表
-            mail_ids = messages[0].split()
-            
-            if not mail_ids:
-                return None
-            
-            # 从最新的邮件开始查找
-            for mail_id in reversed(mail_ids):
-                # 获取邮件
-                status, msg_data = mail.fetch(mail_id, '(RFC822)')
-                
-                if status != 'OK':
+                continue
+            headers = EmailTools._parse_fetch(data)
+            for uid in chunk:
+                raw_header = headers.get(uid)
+                if raw_header is None:
                     continue
-                
-                # 解析邮件
-                if not msg_data or not msg_data[0] or len(msg_data[0]) < 2:
+                header = email.message_from_bytes(raw_header)
+                if EmailTools._header_matches(header, subject, sender, since_ts):
+                    matched.append(uid)
+                    if len(matched) >= limit:
+                        break
+        if not matched:
+            return []
+
+        # 所有匹配的邮件在一次UID FETCH中获取
+        status, data = mail.uid('FETCH', b','.join(matched), '(BODY.PEEK[])')
+        if status != 'OK':
+            return []
+        messages = EmailTools._parse_fetch(data)
+        result = []
+        for uid in matched:
+            raw_email = messages.get(uid)
+            if raw_email is None:
+                continue
+            fields = EmailTools._message_fields(email.message_from_bytes(raw_email), include_attachments)
+            result.append(dict(uid=int(uid), **fields))
+        return result
+
+    @staticmethod
+    def _header_matches(header, subject: str, sender: str, since_ts: float) -> bool:
+        """在客户端按邮件头确认主题、发件人和起始时间条件"""
+        if subject and subject.lower() not in EmailTools._decode_subject(header.get('Subject', '')).lower():
+            return False
+        if sender and sender.lower() not in EmailTools._decode_subject(header.get('From', '')).lower():
+            return False
+        if since_ts is not None:
+            try:
+                if parsedate_to_datetime(header.get('Date', '')).timestamp() < since_ts:
+                    return False
+            except (TypeError, ValueError):
+                # 没有可解析的日期时以服务端的SINCE结果为准
+                pass
+        return True
+
+    @staticmethod
+    def _message_fields(msg, include_attachments: bool = False) -> dict:
+        """
+        把邮件解析为结构化字段
+
+        只解码正文部分，附件默认只读取文件名、类型和大小，不解码内容
+        """
+        text_parts = []
+        html_parts = []
+        attachments = []
+        for part in msg.walk():
+            if part.is_multipart():
+                continue
+            filename = part.get_filename()
+            if filename or part.get_content_disposition() == 'attachment':
+                attachment = {
+                    "filename": EmailTools._decode_subject(filename or ''),
+                    "content_type": part.get_content_type(),
+                    "size": EmailTools._attachment_size(part)
+                }
+                if include_attachments:
+                    payload = part.get_payload(decode=True) or b''
+                    attachment["size"] = len(payload)
+                    attachment["content"] = base64.b64encode(payload).decode('ascii')
+                attachments.append(attachment)
+            elif part.get_content_type() == 'text/plain':
+                text_parts.append(EmailTools._decode_part(part))
+            elif part.get_content_type() == 'text/html':
+                html_parts.append(EmailTools._decode_part(part))
+        return {
+            "from": EmailTools._decode_subject(msg.get('From', '')),
+            "to": EmailTools._decode_subject(msg.get('To', '')),
+            "date": msg.get('Date', ''),
+            "subject": EmailTools._decode_subject(msg.get('Subject', '')),
+            "text": '\n'.join(text_parts).strip(),
+            "html": '\n'.join(html_parts).strip(),
+            "attachments": attachments
+        }
+
+    @staticmethod
+    def _attachment_size(part) -> int:
+        """不解码附件内容，根据传输编码计算附件大小"""
+        raw = part.get_payload()
+        if not isinstance(raw, str):
+            return 0
+        if part.get('Content-Transfer-Encoding', '').strip().lower() == 'base64':
+            data = ''.join(raw.split())
+            return len(data) * 3 // 4 - len(data) + len(data.rstrip('='))
+        return len(raw)
+
+    @staticmethod
+    def _decode_part(part) -> str:
+        """解码单个文本部分，优先使用声明的字符集，解码失败时依次尝试其他编码"""
+        payload = part.get_payload(decode=True) or b''
+        declared = part.get_content_charset()
+        # 标为gb2312的邮件经常包含GBK字符，直接按超集gb18030解码
+        if declared in ('gb2312', 'gbk'):
+            declared = 'gb18030'
+        charsets = [declared, 'utf-8', 'gb18030']
+        for charset in charsets:
+            if not charset:
+                continue
+            try:
+                return payload.decode(charset)
+            except (LookupError, UnicodeDecodeError):
+                continue
+        return payload.decode('latin1')
+
+    @staticmethod
+    def _account_key(imap_server: str, port: int, email_address: str) -> str:
+        return f'{email_address}@{imap_server}:{port}'
+
+    @staticmethod
+    def _parse_since(since: str) -> float:
+        """把 YYYY-MM-DD 或 ISO 8601 时间转换为时间戳，不带时区时按本地时间处理"""
+        try:
+            if _DATE_ONLY_RE.match(since):
+                return datetime.strptime(since, '%Y-%m-%d').timestamp()
+            return datetime.fromisoformat(since.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            raise ValueError(f"无效的时间格式: {since}")
+
+    @staticmethod
+    def _response_int(mail, code: str) -> Optional[int]:
+        """读取SELECT响应中的 UIDVALIDITY / UIDNEXT / HIGHESTMODSEQ 等状态码"""
+        _, data = mail.response(code)
+        if not data or data[-1] is None:
+            return None
+        try:
+            return int(data[-1])
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _sync(mail, account: str, inbox: str) -> dict:
+        """在已登录的连接上把邮箱增量同步到本地索引"""
+        status, data = mail.select(inbox, readonly=True)
+        if status != 'OK':
+            raise ValueError(f"打开邮箱失败: {inbox}")
+        exists = int(data[0] or 0)
+        uidvalidity = EmailTools._response_int(mail, 'UIDVALIDITY')
+        uidnext = EmailTools._response_int(mail, 'UIDNEXT')
+        # 支持CONDSTORE的服务端在SELECT/EXAMINE响应中返回HIGHESTMODSEQ
+        modseq = EmailTools._response_int(mail, 'HIGHESTMODSEQ')
+
+        state = _email_index.get_state(account, inbox)
+        if state is not None and state["uidvalidity"] != uidvalidity:
+            # UIDVALIDITY变化后旧的UID全部失效
+            _email_index.reset(account, inbox)
+            state = None
+
+        result = {"unchanged": False, "added": 0, "removed": 0, "exists": exists}
+        if state is not None and state["count"] == exists:
+            if modseq is not None and state["highestmodseq"] == modseq \
+                    or modseq is None and uidnext is not None and state["uidnext"] == uidnext:
+                result["unchanged"] = True
+                _email_index.save_state(account, inbox, uidvalidity, uidnext, modseq, state["last_uid"])
+                return result
+
+        last_uid = state["last_uid"] if state else 0
+        new_uids = []
+        if exists and (uidnext is None or uidnext > last_uid + 1):
+            status, messages = mail.uid('SEARCH', 'UID', f'{last_uid + 1}:*')
+            if status == 'OK':
+                # n:* 在没有更新的邮件时也会返回最后一封，需要再过滤一次
+                new_uids = [uid for uid in b' '.join(messages).split() if int(uid) > last_uid]
+
+        for i in range(0, len(new_uids), SYNC_FETCH_CHUNK):
+            chunk = new_uids[i:i + SYNC_FETCH_CHUNK]
+            status, data = mail.uid('FETCH', b','.join(chunk), '(BODY.PEEK[])')
+            if status != 'OK':
+                raise ValueError("同步邮件失败")
+            rows = []
+            for uid, raw_email in EmailTools._parse_fetch(data).items():
+                rows.append((int(uid),) + EmailTools._index_fields(email.message_from_bytes(raw_email)))
+                last_uid = max(last_uid, int(uid))
+            _email_index.add_messages(account, inbox, rows)
+            result["added"] += len(rows)
+
+        if (state["count"] if state else 0) + result["added"] != exists:
+            # 有邮件被删除，按服务端现有的UID清理索引
+            status, messages = mail.uid('SEARCH', 'ALL')
+            if status == 'OK':
+                keep = {int(uid) for uid in b' '.join(messages).split()}
+                result["removed"] = _email_index.prune(account, inbox, keep)
+
+        _email_index.save_state(account, inbox, uidvalidity, uidnext, modseq, last_uid)
+        return result
+
+    @staticmethod
+    def _index_fields(msg) -> tuple:
+        """提取写入索引的 (主题, 发件人, 日期, 时间戳, 正文)"""
+        date = msg.get('Date', '')
+        try:
+            timestamp = parsedate_to_datetime(date).timestamp() if date else None
+        except (TypeError, ValueError):
+            timestamp = None
+        return (
+            EmailTools._decode_subject(msg.get('Subject', '')),
+            EmailTools._decode_subject(msg.get('From', '')),
+            date,
+            timestamp,
+            EmailTools._get_email_body(msg)
+        )
+
+    @staticmethod
+    def pool_stats() -> dict:
+        """返回IMAP连接池的统计"""
+        return _imap_pool.stats()
+
+    @staticmethod
+    def _find_last_email(mail, inbox: str, subject: str, html_to_text: bool = False) -> Optional[str]:
+        """
+        在已登录的连接上查找主题匹配的最后一封邮件
+
+        主题在服务端用 UID SEARCH SUBJECT 过滤，候选邮件从新到旧分批只取
+        Subject/Date头确认匹配，最后只下载一封邮件的完整内容。
+        邮箱以只读方式打开，并使用 BODY.PEEK，不会把邮件标记为已读
+        """
+        # 以只读方式选择收件箱(EXAMINE)
+        status, _ = mail.select(inbox, readonly=True)
+        if status != 'OK':
+            return None
+
+        uids = EmailTools._search_subject(mail, subject)
+        if not uids:
+            return None
+        if not subject:
+            # 未指定主题时只需要最新的一封
+            uids = uids[-1:]
+
+        # 从最新的邮件开始，分批只获取主题头确认匹配
+        uids.reverse()
+        for i in range(0, len(uids), HEADER_FETCH_CHUNK):
+            chunk = uids[i:i + HEADER_FETCH_CHUNK]
+            status, data = mail.uid('FETCH', b','.join(chunk), '(BODY.PEEK[HEADER.FIELDS (SUBJECT DATE)])')
+            if status != 'OK':
+                continue
+            headers = EmailTools._parse_fetch(data)
+            for uid in chunk:
+                raw_header = headers.get(uid)
+                if raw_header is None:
                     continue
-                raw_email = msg_data[0][1]
-                if isinstance(raw_email, (bytes, bytearray)):
-                    msg = email.message_from_bytes(raw_email)
-                else:
+                header = email.message_from_bytes(raw_header)
+                subject_str = EmailTools._decode_subject(header.get('Subject', ''))
+                # 检查主题是否匹配
+                if subject.lower() not in subject_str.lower():
+                    continue
+                # 只获取匹配邮件的完整内容
+                status, data = mail.uid('FETCH', uid, '(BODY.PEEK[])')
+                raw_email = EmailTools._parse_fetch(data).get(uid) if status == 'OK' else None
+                if raw_email is None:
+                    continue
+                return EmailTools._get_email_body(email.message_from_bytes(raw_email), html_to_text)
+
+        return None
+
+    @staticmethod
+    def _search_subject(mail, subject: str, extra: tuple = ()) -> list:
+        """
+        在服务端按主题搜索，返回从旧到新的UID列表
+
+        非ASCII主题以UTF-8字面量发送；服务端不支持UTF-8搜索(BADCHARSET)时
+        退回只按 extra 中的其他条件搜索，由调用方在客户端按主题头过滤
+
+        Args:
+            extra: 附加的ASCII搜索条件，如 ('FROM', '"a@example.com"', 'SINCE', '01-Mar-2024')
+        """
+        if subject:
+            encoded = subject.encode('utf-8')
+            attempts = [('CHARSET', 'UTF-8') + tuple(extra) + ('SUBJECT',)]
+            if subject.isascii():
+                attempts.append(tuple(extra) + ('SUBJECT',))
+            for criteria in attempts:
+                mail.literal = encoded
+                try:
+                    status, messages = mail.uid('SEARCH', *criteria)
+                except imaplib.IMAP4.abort:
+                    raise
+                except imaplib.IMAP4.error:
                     continue
-                
-                # 解码邮件主题
-                subject_header = msg.get('Subject', '')
-                if subject_header:
-                    decoded_subject = decode_header(subject_header)[0]
-                    if decoded_subject[1] is not None:
-                        subject_str = decoded_subject[0].decode(decoded_subject[1])
-                    else:
-                        subject_str = str(decoded_subject[0])
+                finally:
+                    mail.literal = None
+                if status == 'OK':
+                    return b' '.join(messages).split()
+
+        # 搜索所有邮件
+        status, messages = mail.uid('SEARCH', *(extra or ('ALL',)))
+        if status != 'OK':
+            return []
+        return b' '.join(messages).split()
+
+    @staticmethod
+    def _parse_fetch(data) -> dict:
+        """
+        把FETCH响应解析为 UID到字面量内容 的字典
+
+        服务器可能把UID放在字面量之前(元组的第一项)，也可能放在字面量之后，
+        此时UID出现在元组后面的字节串中，如 b' UID 7)'
+        """
+        result = {}
+        pending = None
+        for item in data or []:
+            if isinstance(item, tuple) and len(item) >= 2:
+                match = _UID_RE.search(item[0])
+                if match:
+                    result[match.group(1)] = item[1]
+                    pending = None
                 else:
-                    subject_str = ""
-                
-                # 检查主题是否匹配
-                if subject.lower() in subject_str.lower():
-                    # 获取邮件内容
-                    body = EmailTools._get_email_body(msg)
-                    
-                    # 关闭连接
-                    mail.close()
-                    mail.logout()
-                    
-                    return body
-            
-            # 关闭连接
-            mail.close()
-            mail.logout()
-            
-            return None
-            
-        except Exception as e:
-            print(f"获取邮件时出错: {str(e)}")
-            return None
-    
+                    pending = item[1]
+            elif pending is not None and isinstance(item, bytes):
+                match = _UID_RE.search(item)
+                if match:
+                    result[match.group(1)] = pending
+                    pending = None
+        return result
+
     @staticmethod
-    def _get_email_body(msg) -> str:
+    def _decode_subject(subject_header: str) -> str:
+        """解码邮件主题，兼容多段编码和未知字符集"""
+        if not subject_header:
+            return ""
+        parts = []
+        for value, charset in decode_header(subject_header):
+            if isinstance(value, bytes):
+                try:
+                    value = value.decode(charset or 'utf-8')
+                except (LookupError, UnicodeDecodeError):
+                    value = value.decode('latin1')
+            parts.append(value)
+        return ''.join(parts)
+
+    @staticmethod
+    def _get_email_body(msg, html_to_text: bool = False) -> str:
         """
         提取邮件正文内容
+
+        每个部分只解码一次，优先使用声明的字符集；multipart/alternative 只取
+        其中一种表示(优先纯文本)，不会把纯文本和HTML版本拼接在一起
         
         Args:
             msg: email.message对象
+            html_to_text: 是否把HTML正文转换为纯文本
             
         Returns:
             邮件正文字符串
         """
-        body = ""
-        
-        if msg.is_multipart():
-            # 处理多部分邮件
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition", ""))
-                
-                # 跳过附件
-                if "attachment" in content_disposition:
-                    continue
-                
-                # 获取文本内容
-                if content_type == "text/plain" or content_type == "text/html":
-                    try:
-                        body += part.get_payload(decode=True).decode('utf-8')
-                    except UnicodeDecodeError:
-                        # 尝试其他编码
-                        try:
-                            body += part.get_payload(decode=True).decode('gb2312')
-                        except:
-                            body += part.get_payload(decode=True).decode('latin1')
-        else:
-            # 处理单部分邮件
-            try:
-                body = msg.get_payload(decode=True).decode('utf-8')
-            except UnicodeDecodeError:
-                try:
-                    body = msg.get_payload(decode=True).decode('gb2312')
-                except:
-                    body = msg.get_payload(decode=True).decode('latin1')
-        return body.strip()
\ No newline at end of file
+        parts = []
+        EmailTools._collect_body(msg, parts, html_to_text)
+        return '\n'.join(parts).strip()
+
+    @staticmethod
+    def _collect_body(part, parts: list, html_to_text: bool):
+        """递归收集正文部分，跳过附件"""
+        if part.is_multipart():
+            children = part.get_payload()
+            if part.get_content_subtype() == 'alternative' and children:
+                # 各子部分是同一内容的不同表示，取纯文本，没有时取最后(最丰富)的一个
+                plain = [child for child in children if child.get_content_type() == 'text/plain']
+                children = plain[:1] or children[-1:]
+            for child in children:
+                EmailTools._collect_body(child, parts, html_to_text)
+            return
+
+        # 跳过附件
+        if part.get_content_disposition() == 'attachment':
+            return
+        content_type = part.get_content_type()
+        if content_type == 'text/plain':
+            parts.append(EmailTools._decode_part(part))
+        elif content_type == 'text/html':
+            html = EmailTools._decode_part(part)
+            parts.append(EmailTools._html_to_text(html) if html_to_text else html)
+
+    @staticmethod
+    def _html_to_text(html: str) -> str:
+        """把HTML转换为纯文本，去掉脚本和样式"""
+        # lxml不接受带编码声明的str
+        html = _XML_DECLARATION_RE.sub('', html, count=1).strip()
+        if not html:
+            return ''
+        try:
+            doc = pq(html, parser='html')
+        except Exception:
+            return _TAG_RE.sub(' ', html)
+        doc('script, style, head').remove()
+        return doc.text()
@@ -3,63 +3,338 @@
 """
 import shutil
 import os
+import stat
+import json
+import mmap
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 稀疏行索引：每隔多少行记录一次行首偏移
+_LINE_INDEX_STEP = 1024
+# 最多缓存多少个文件的行索引
+_LINE_INDEX_MAX_FILES = 64
+# 增量复制时写在目标目录下的清单文件名
+_COPY_MANIFEST = '.copy_manifest.json'
+# 单次 copy_file_range 调用的最大字节数
+_COPY_CHUNK = 64 * 1024 * 1024
+
+
+class _LineIndex:
+    """
+    文件的稀疏行偏移索引
+
+    checkpoints[i] 为第 i * _LINE_INDEX_STEP 行(从0开始)的行首字节偏移，
+    按需向后扩展，因此同一文件后续的窗口读取只需扫描窗口附近的内容
+    """
+    def __init__(self, size: int, mtime_ns: int):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.checkpoints = [0]
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def line_offset(self, mm, line_no: int):
+        """
+        返回指定行(从0开始)的行首偏移，超出文件末尾时返回None
+        """
+        slot = line_no // _LINE_INDEX_STEP
+        with self.lock:
+            while len(self.checkpoints) <= slot:
+                if self.complete:
+                    return None
+                pos = self.checkpoints[-1]
+                for _ in range(_LINE_INDEX_STEP):
+                    nl = mm.find(b'\n', pos)
+                    if nl == -1:
+                        pos = self.size
+                        break
+                    pos = nl + 1
+                if pos >= self.size:
+                    self.complete = True
+                    return None
+                self.checkpoints.append(pos)
+            pos = self.checkpoints[slot]
+
+        # 从最近的检查点向后逐行定位
+        for _ in range(line_no - slot * _LINE_INDEX_STEP):
+            nl = mm.find(b'\n', pos)
+            if nl == -1:
+                return None
+            pos = nl + 1
+        if pos >= self.size:
+            return None
+        return pos
+
+
+_line_index_cache = OrderedDict()
+_line_index_lock = threading.Lock()
+
+
+def _get_line_index(file_path: str, st: os.stat_result) -> _LineIndex:
+    """获取(或重建)文件的行索引，文件大小或修改时间变化时索引失效"""
+    key = os.path.realpath(file_path)
+    with _line_index_lock:
+        index = _line_index_cache.get(key)
+        if index is None or index.size != st.st_size or index.mtime_ns != st.st_mtime_ns:
+            index = _LineIndex(st.st_size, st.st_mtime_ns)
+            _line_index_cache[key] = index
+        _line_index_cache.move_to_end(key)
+        while len(_line_index_cache) > _LINE_INDEX_MAX_FILES:
+            _line_index_cache.popitem(last=False)
+        return index
+
 
 class FileSystem:
     """
     文件系统操作类 
     """
     @staticmethod
-    def read_file(file_path: str) -> str:
+    def read_file(file_path: str, offset: int = None, length: int = None,
+                  start_line: int = None, end_line: int = None, tail_lines: int = None) -> str:
         """
-        读取文件内容
+        读取文件内容，支持按字节范围、行范围或末尾N行读取
         
         参数:
             file_path: 文件路径
+            offset: 起始字节偏移(字节范围模式)
+            length: 读取的字节数，为空则读到文件末尾
+            start_line: 起始行号，从1开始(行范围模式)
+            end_line: 结束行号(包含)，为空则读到文件末尾
+            tail_lines: 读取文件末尾的行数(末尾模式)
         """
         # 检查文件是否存在
         if not os.path.exists(file_path):
             raise FileNotFoundError(f'文件不存在: {file_path}')
-        
-        # 读取文件内容
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        return content
+
+        modes = [offset is not None or length is not None,
+                 start_line is not None or end_line is not None,
+                 tail_lines is not None]
+        if sum(modes) > 1:
+            raise ValueError('字节范围、行范围和末尾行数只能选择一种读取方式')
+
+        if not any(modes):
+            # 读取文件内容
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return content
+
+        st = os.stat(file_path)
+        if st.st_size == 0:
+            return ''
+
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if modes[0]:
+                data = FileSystem._read_bytes(mm, offset or 0, length)
+            elif modes[1]:
+                index = _get_line_index(file_path, st)
+                data = FileSystem._read_lines(mm, index, start_line or 1, end_line)
+            else:
+                data = FileSystem._read_tail(mm, tail_lines)
+        # 字节窗口可能截断多字节字符，使用替换字符而不是报错
+        return data.decode('utf-8', errors='replace')
+
+    @staticmethod
+    def _read_bytes(mm, offset: int, length: int = None) -> bytes:
+        """读取 [offset, offset + length) 范围内的字节"""
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError('offset和length不能为负数')
+        end = len(mm) if length is None else min(offset + length, len(mm))
+        return mm[offset:end]
+
+    @staticmethod
+    def _read_lines(mm, index: _LineIndex, start_line: int, end_line: int = None) -> bytes:
+        """读取第 start_line 到 end_line 行(从1开始，包含两端)"""
+        if start_line < 1 or (end_line is not None and end_line < start_line):
+            raise ValueError('行号从1开始，且end_line不能小于start_line')
+        start = index.line_offset(mm, start_line - 1)
+        if start is None:
+            return b''
+        end = None if end_line is None else index.line_offset(mm, end_line)
+        return mm[start:len(mm) if end is None else end]
+
+    @staticmethod
+    def _read_tail(mm, lines: int) -> bytes:
+        """从文件末尾向前查找，读取最后 lines 行"""
+        if lines < 0:
+            raise ValueError('tail_lines不能为负数')
+        if lines == 0:
+            return b''
+        pos = len(mm)
+        # 文件以换行结尾时，最后一个换行不算作新的一行
+        if mm[pos - 1] == ord('\n'):
+            pos -= 1
+        start = 0
+        for _ in range(lines):
+            nl = mm.rfind(b'\n', 0, pos)
+            if nl == -1:
+                start = 0
+                break
+            start = nl + 1
+            pos = nl
+        return mm[start:]
     @staticmethod
-    def write_file(file_path: str, content: str) -> str:
+    def write_file(file_path: str, content: str, append: bool = False) -> str:
         """
         写入文件内容
         
         参数:
             file_path: 文件路径
             content: 要写入的内容
+            append: 是否追加到文件末尾
         """
+        return FileSystem.write_files([{'path': file_path, 'content': content}], append)
+
+    @staticmethod
+    def write_files(files: list, append: bool = False) -> str:
+        """
+        批量写入多个文件
+
+        覆盖写入时先把所有内容写入同目录下的临时文件，全部成功后再用
+        os.replace 逐个替换目标文件，写入阶段失败不会改动任何目标文件，
+        也不会留下被截断的文件。目标是符号链接时写入链接指向的文件，
+        已有文件的权限和属主会保留。
+
+        落盘分两步：所有文件写完后集中同步一遍各文件的数据(替换后内容才完整，
+        这一步每个文件一次)，替换或追加完成后每个目录只fsync一次
+
+        参数:
+            files: 文件列表，每项为 {"path": 文件路径, "content": 要写入的内容}
+            append: 是否追加到文件末尾(追加模式直接写入原文件)
+        """
+        items = []
+        for item in files:
+            path = item.get('path')
+            if not path:
+                raise ValueError('每个文件都需要提供path')
+            # 解析符号链接，替换的是链接指向的文件而不是链接本身
+            items.append((os.path.realpath(path), item.get('content') or ''))
+
         # 确保目标文件夹存在
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # 写入文件内容
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-            
+        dirs = set()
+        for path, _ in items:
+            dir_path = os.path.dirname(path)
+            if dir_path not in dirs:
+                os.makedirs(dir_path, exist_ok=True)
+                dirs.add(dir_path)
+
+        if append:
+            for path, content in items:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(content)
+            for path, _ in items:
+                FileSystem._sync_file(path)
+        else:
+            temps = []
+            try:
+                for path, content in items:
+                    temps.append((FileSystem._write_temp(path, content), path))
+                for tmp_path, _ in temps:
+                    FileSystem._sync_file(tmp_path)
+                while temps:
+                    tmp_path, path = temps[0]
+                    os.replace(tmp_path, path)
+                    temps.pop(0)
+            finally:
+                # 清理未能替换的临时文件
+                for tmp_path, _ in temps:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+
+        FileSystem._fsync_dirs(dirs)
         return "success"
-        
+
+    @staticmethod
+    def _write_temp(file_path: str, content: str) -> str:
+        """
+        把内容写入目标文件同目录下的临时文件，返回临时文件路径(数据由调用方统一同步)
+
+        目标文件已存在时把它的权限和属主(有权限时)复制到临时文件上，
+        替换后文件的元数据与原来一致
+        """
+        dir_path, name = os.path.split(os.path.abspath(file_path))
+        tmp_path = os.path.join(dir_path, f'.{name}.{uuid.uuid4().hex}.tmp')
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                st = None
+            if st is not None:
+                os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+                if hasattr(os, 'chown'):
+                    try:
+                        os.chown(tmp_path, st.st_uid, st.st_gid)
+                    except OSError:
+                        # 非root用户不能把属主改成其他用户，保留当前用户
+                        pass
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
     @staticmethod
-    def copy_dir(from_path: str, to_path: str) -> str:
+    def _sync_file(file_path: str):
+        """把文件数据刷到磁盘，有 fdatasync 时只同步数据和必要的元数据"""
+        fd = os.open(file_path, os.O_WRONLY)
+        try:
+            getattr(os, 'fdatasync', os.fsync)(fd)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _fsync_dirs(dirs):
+        """fsync目录，使文件的创建和替换落盘(Windows不支持打开目录，直接跳过)"""
+        if os.name == 'nt':
+            return
+        for dir_path in dirs:
+            try:
+                fd = os.open(dir_path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def copy_dir(from_path: str, to_path: str, incremental: bool = False,
+                 use_hash: bool = False, workers: int = 8) -> str:
         """
         复制目录
         
         参数:
-            src: 源目录路径
-            dst: 目标目录路径
+            from_path: 源目录路径
+            to_path: 目标目录路径
+            incremental: 是否增量复制，根据目标目录下的清单跳过未变化的文件
+            use_hash: 增量复制时，大小相同但修改时间不同的文件再用BLAKE2哈希比较一次
+            workers: 并行复制的线程数
+        返回:
+            非增量模式返回"success"，增量模式返回包含复制统计的JSON字符串
         """
             # 如果源目录不存在就退出
         if not os.path.isdir(from_path):
             raise FileNotFoundError(f'源目录不存在: {from_path}')
 
+        start_time = time.monotonic()
+
         # 创建目标目录
         os.makedirs(to_path, exist_ok=True)
 
-        # 复制所有文件（包含子目录）
+        manifest_path = os.path.join(to_path, _COPY_MANIFEST)
+        old_manifest = FileSystem._load_manifest(manifest_path) if incremental else {}
+
+        # 遍历源目录，创建目标子目录并收集需要复制的文件
+        jobs = []
         for root, _, files in os.walk(from_path):
             # 计算目标路径
             relative_path = os.path.relpath(root, from_path)
@@ -68,10 +343,120 @@ class FileSystem:
             # 创建目标子目录
             os.makedirs(target_dir, exist_ok=True)
             
-            # 复制当前目录下的所有文件
             for file in files:
-                src_file = os.path.join(root, file)
-                dst_file = os.path.join(target_dir, file)
-                shutil.copy2(src_file, dst_file)
+                if relative_path == '.' and file == _COPY_MANIFEST:
+                    continue
+                rel_file = os.path.normpath(os.path.join(relative_path, file)).replace(os.sep, '/')
+                jobs.append((rel_file, os.path.join(root, file), os.path.join(target_dir, file)))
+
+        def copy_one(job):
+            rel_file, src_file, dst_file = job
+            st = os.stat(src_file)
+            entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            if incremental:
+                skipped, digest = FileSystem._is_unchanged(src_file, dst_file, st, old_manifest.get(rel_file), use_hash)
+                if digest:
+                    entry['blake2b'] = digest
+                if skipped:
+                    return rel_file, entry, False
+            FileSystem._copy_file(src_file, dst_file)
+            if incremental and use_hash and 'blake2b' not in entry:
+                # 记录哈希，之后只有修改时间变化时不必重新复制
+                entry['blake2b'] = FileSystem._blake2b(src_file)
+            return rel_file, entry, True
 
-        return "success"
\ No newline at end of file
+        new_manifest = {}
+        stats = {'files_copied': 0, 'files_skipped': 0, 'bytes_copied': 0, 'bytes_skipped': 0}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for rel_file, entry, copied in pool.map(copy_one, jobs):
+                new_manifest[rel_file] = entry
+                if copied:
+                    stats['files_copied'] += 1
+                    stats['bytes_copied'] += entry['size']
+                else:
+                    stats['files_skipped'] += 1
+                    stats['bytes_skipped'] += entry['size']
+
+        if not incremental:
+            return "success"
+
+        FileSystem._save_manifest(manifest_path, new_manifest)
+        elapsed = time.monotonic() - start_time
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['throughput_mb_s'] = round(stats['bytes_copied'] / 1024 / 1024 / elapsed, 2) if elapsed > 0 else 0
+        return json.dumps(stats, ensure_ascii=False)
+
+    @staticmethod
+    def _is_unchanged(src_file: str, dst_file: str, st: os.stat_result, entry: dict, use_hash: bool):
+        """
+        判断源文件相对于上次复制是否未变化
+
+        返回:
+            (是否可以跳过, 源文件的BLAKE2哈希，未计算时为None)
+        """
+        if not entry or entry.get('size') != st.st_size:
+            return False, None
+        # 目标文件被删除或改动过时必须重新复制
+        try:
+            if os.path.getsize(dst_file) != st.st_size:
+                return False, None
+        except OSError:
+            return False, None
+        if entry.get('mtime_ns') == st.st_mtime_ns:
+            return True, entry.get('blake2b')
+        if not use_hash:
+            return False, None
+        digest = FileSystem._blake2b(src_file)
+        return digest == entry.get('blake2b'), digest
+
+    @staticmethod
+    def _blake2b(file_path: str) -> str:
+        """计算文件的BLAKE2b哈希"""
+        h = hashlib.blake2b()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    @staticmethod
+    def _copy_file(src_file: str, dst_file: str):
+        """
+        复制单个文件及其元数据，优先使用 copy_file_range 零拷贝，
+        不支持或复制不完整时退回 shutil.copyfile (内部使用 sendfile/fcopyfile)
+        """
+        copied = False
+        if hasattr(os, 'copy_file_range'):
+            try:
+                with open(src_file, 'rb') as fsrc, open(dst_file, 'wb') as fdst:
+                    size = os.fstat(fsrc.fileno()).st_size
+                    total = 0
+                    while True:
+                        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), _COPY_CHUNK)
+                        if not n:
+                            break
+                        total += n
+                # 部分文件系统(如procfs、部分网络文件系统)会直接返回0而不是报错
+                copied = total >= size
+            except OSError:
+                copied = False
+        if not copied:
+            shutil.copyfile(src_file, dst_file)
+        shutil.copystat(src_file, dst_file)
+
+    @staticmethod
+    def _load_manifest(manifest_path: str) -> dict:
+        """读取复制清单，不存在或损坏时返回空清单"""
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            return manifest.get('files', {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    @staticmethod
+    def _save_manifest(manifest_path: str, files: dict):
+        """写入复制清单，先写临时文件再替换，避免中断时留下损坏的清单"""
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': files}, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
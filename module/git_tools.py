@@ -1,22 +1,210 @@
 import os
-from typing import Optional, Dict, Any
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, Tuple, List, Iterator
 from git import Repo, Commit
 from git.diff import Diff
 
+logger = logging.getLogger(__name__)
+
+
+class _RepoPool:
+    """
+    进程内共享的 git.Repo 对象池
+
+    同一路径(解析符号链接后)复用同一个Repo对象，GitPython会在其上保留常驻的
+    cat-file --batch 进程，重复调用无需重新初始化。每个仓库配一把可重入锁，
+    保证并发的工具调用串行使用同一个Repo；空闲超过 idle_timeout 秒或超出
+    max_repos 的仓库会被关闭
+    """
+
+    def __init__(self, idle_timeout: float = 600, max_repos: int = 32):
+        self.idle_timeout = idle_timeout
+        self.max_repos = max_repos
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, repo_path: str) -> Tuple[Repo, threading.RLock]:
+        """获取仓库对应的 (Repo, 锁)"""
+        key = os.path.realpath(repo_path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {'repo': Repo(key), 'lock': threading.RLock(), 'last_used': now}
+                self._entries[key] = entry
+            entry['last_used'] = now
+            self._evict(now, keep=key)
+            return entry['repo'], entry['lock']
+
+    def _evict(self, now: float, keep: str):
+        """关闭空闲或超出数量上限的仓库，正在使用(锁被占用)的仓库跳过"""
+        candidates = sorted(self._entries.items(), key=lambda item: item[1]['last_used'])
+        excess = len(self._entries) - self.max_repos
+        for key, entry in candidates:
+            if key == keep:
+                continue
+            if excess <= 0 and now - entry['last_used'] < self.idle_timeout:
+                break
+            if entry['lock'].acquire(blocking=False):
+                try:
+                    entry['repo'].close()
+                finally:
+                    entry['lock'].release()
+                del self._entries[key]
+                excess -= 1
+
+    def clear(self):
+        """关闭所有仓库"""
+        with self._lock:
+            for entry in self._entries.values():
+                with entry['lock']:
+                    entry['repo'].close()
+            self._entries.clear()
+
+
+_repo_pool = _RepoPool()
+
+
+class _DiffCache:
+    """
+    diff结果缓存，键为解析后的完整commit SHA加上路径和选项
+
+    同一个SHA的diff永远不变，因此结果可以一直复用；HEAD、分支名等会移动的引用
+    在查缓存前先解析成SHA。内存层按近似字节数做LRU淘汰；设置了 path 时
+    再加一层sqlite磁盘缓存，同样按字节数上限淘汰最久未使用的条目
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, path: str = None, max_disk_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS diffs (key TEXT PRIMARY KEY, value TEXT, size INTEGER, last_used REAL)'
+            )
+        return self._conn
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """返回缓存的结果(每次返回新的副本)，未命中返回None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(value)
+            if self.path:
+                conn = self._connect()
+                row = conn.execute('SELECT value FROM diffs WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE diffs SET last_used = ? WHERE key = ?', (time.time(), key))
+                    conn.commit()
+                    self._put_memory(key, row[0])
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        value = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._put_memory(key, value)
+            if self.path and len(value) <= self.max_disk_bytes:
+                conn = self._connect()
+                conn.execute('INSERT OR REPLACE INTO diffs (key, value, size, last_used) VALUES (?, ?, ?, ?)',
+                             (key, value, len(value), time.time()))
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM diffs').fetchone()[0]
+                while total > self.max_disk_bytes:
+                    row = conn.execute('SELECT key, size FROM diffs ORDER BY last_used LIMIT 1').fetchone()
+                    conn.execute('DELETE FROM diffs WHERE key = ?', (row[0],))
+                    total -= row[1]
+                    self.evictions += 1
+                conn.commit()
+
+    def _put_memory(self, key: str, value: str):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = value
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+            if self.path:
+                row = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM diffs').fetchone()
+                stats["disk_entries"], stats["disk_bytes"] = row
+            return stats
+
+
+# 设置 GIT_DIFF_CACHE_PATH 时启用磁盘缓存
+_diff_cache = _DiffCache(path=os.getenv('GIT_DIFF_CACHE_PATH') or None)
+
+
+# 已检查过commit-graph的仓库(按git公共目录)
+_commit_graph_checked = set()
+
+
+def _with_repo_lock(method):
+    """在仓库锁内执行方法"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class GitTools:
     """Git工具类，提供各种Git操作功能"""
     
     def __init__(self, repo_path: str = None):
         """
-        初始化Git工具类
+        初始化Git工具类，同一仓库的Repo对象从进程内的对象池中复用
         
         Args:
             repo_path: Git仓库路径，如果为None则使用当前目录
         """
         self.repo_path = repo_path or os.getcwd()
-        self.repo = Repo(self.repo_path)
+        self.repo, self._lock = _repo_pool.get(self.repo_path)
     
+    @_with_repo_lock
     def get_diff(self, file_path: str, commit_hash: str, ignore_whitespace: bool = True) -> Dict[str, Any]:
         """
         获取指定commit中文件的改动详情
@@ -40,8 +228,13 @@ class GitTools:
             ValueError: 当commit不存在或文件不存在时抛出异常
         """
         try:
-            # 获取指定commit
+            # 获取指定commit，缓存键使用解析后的SHA，HEAD等引用移动后不会命中旧结果
             commit = self.repo.commit(commit_hash)
+            cache_key = _DiffCache.make_key('diff', commit.hexsha, file_path, ignore_whitespace)
+            cached = _diff_cache.get(cache_key)
+            if cached is not None:
+                cached['commit_hash'] = commit_hash
+                return cached
             
             # 获取该commit的父commit（如果有的话）
             parent_commit = commit.parents[0] if commit.parents else None
@@ -67,15 +260,17 @@ class GitTools:
             diff_obj = diff_index[0]
             
             # 解析diff信息
+            additions, deletions = self._count_changes(diff_obj)
             result = {
                 'file_path': file_path,
                 'commit_hash': commit_hash,
                 'diff_text': diff_obj.diff.decode('utf-8') if diff_obj.diff else '',
                 'change_type': self._get_change_type(diff_obj),
-                'additions': self._count_additions(diff_obj),
-                'deletions': self._count_deletions(diff_obj),
+                'additions': additions,
+                'deletions': deletions,
                 'is_binary': diff_obj.a_blob and diff_obj.a_blob.data_stream is None
             }
+            _diff_cache.put(cache_key, result)
             
             return result
             
@@ -93,69 +288,457 @@ class GitTools:
         else:
             return 'M'  # 修改
     
-    def _count_additions(self, diff_obj: Diff) -> int:
-        """统计新增行数"""
-        if not diff_obj.diff:
-            return 0
-        
-        diff_text = diff_obj.diff.decode('utf-8')
-        # 统计以'+'开头的行（排除diff头信息）
-        additions = [line for line in diff_text.split('\n') 
-                    if line.startswith('+') and not line.startswith('+++')]
-        
-        # 过滤掉只是换行符变化的行
-        real_additions = []
-        for i, line in enumerate(additions):
-            # 检查对应的删除行是否存在，如果只是换行符变化，则不计入
-            deletion_line = line[1:]  # 去掉开头的'+'
-            has_corresponding_deletion = False
-            
-            # 在删除行中查找对应的行
-            deletions = [d_line for d_line in diff_text.split('\n') 
-                        if d_line.startswith('-') and not d_line.startswith('---')]
-            
-            for del_line in deletions:
-                if del_line[1:].strip() == deletion_line.strip():
-                    has_corresponding_deletion = True
-                    break
-            
-            # 如果没有对应的删除行，或者内容有实质性变化，才计入
-            if not has_corresponding_deletion or line.strip() != deletion_line.strip():
-                real_additions.append(line)
-        
-        return len(real_additions)
-    
-    def _count_deletions(self, diff_obj: Diff) -> int:
-        """统计删除行数"""
+    def _count_changes(self, diff_obj: Diff) -> Tuple[int, int]:
+        """
+        单次遍历diff统计新增和删除行数，结果与 git diff --numstat 一致
+
+        GitPython生成的patch不含 ---/+++ 文件头，这里仍跳过第一个 @@ 之前的内容，
+        因此以 '+++' 或 '---' 开头的正文行也能正确计数。
+        空白字符变化已由 ignore_whitespace 对应的diff参数处理
+
+        Returns:
+            (新增行数, 删除行数)
+        """
         if not diff_obj.diff:
-            return 0
-        
-        diff_text = diff_obj.diff.decode('utf-8')
-        # 统计以'-'开头的行（排除diff头信息）
-        deletions = [line for line in diff_text.split('\n') 
-                    if line.startswith('-') and not line.startswith('---')]
-        
-        # 过滤掉只是换行符变化的行
-        real_deletions = []
-        for i, line in enumerate(deletions):
-            # 检查对应的新增行是否存在，如果只是换行符变化，则不计入
-            addition_line = line[1:]  # 去掉开头的'-'
-            has_corresponding_addition = False
-            
-            # 在新增行中查找对应的行
-            additions = [a_line for a_line in diff_text.split('\n') 
-                        if a_line.startswith('+') and not a_line.startswith('+++')]
-            
-            for add_line in additions:
-                if add_line[1:].strip() == addition_line.strip():
-                    has_corresponding_addition = True
-                    break
-            
-            # 如果没有对应的新增行，或者内容有实质性变化，才计入
-            if not has_corresponding_addition or line.strip() != addition_line.strip():
-                real_deletions.append(line)
-        
-        return len(real_deletions)
+            return 0, 0
+
+        additions = 0
+        deletions = 0
+        in_hunk = False
+        for line in diff_obj.diff.split(b'\n'):
+            if line.startswith(b'@@'):
+                in_hunk = True
+            elif not in_hunk:
+                continue
+            elif line.startswith(b'+'):
+                additions += 1
+            elif line.startswith(b'-'):
+                deletions += 1
+        return additions, deletions
+
+
+    def iter_commit_diff(self, revision: str, paths: Optional[List[str]] = None, ignore_whitespace: bool = True,
+                         max_patch_bytes: int = 64 * 1024, max_total_bytes: int = 1024 * 1024) -> Iterator[Dict[str, Any]]:
+        """
+        用一次 git diff 调用获取commit或提交区间内所有改动文件，边读取输出边逐个产出文件
+
+        Args:
+            revision: commit哈希/引用(与第一个父commit比较，初始commit与空树比较)，
+                或 "A..B" / "A...B" 形式的提交区间
+            paths: 只包含这些路径(pathspec)，为空则包含全部文件
+            ignore_whitespace: 是否忽略空白字符变化
+            max_patch_bytes: 单个文件patch的最大字节数，超出部分截断
+            max_total_bytes: 所有文件patch的总字节数上限，用尽后后续文件只返回统计
+
+        Yields:
+            每个文件的改动详情：
+            - file_path: 文件路径
+            - old_path: 重命名/复制前的路径
+            - change_type: 变更类型（A:新增, M:修改, D:删除, R:重命名, C:复制）
+            - additions / deletions: 新增/删除行数(始终按完整diff统计)
+            - is_binary: 是否为二进制文件
+            - diff_text: patch内容，被截断时末尾带截断标记
+            - truncated: patch是否被截断
+        """
+        options = ['--no-color', '--no-ext-diff', '-M']
+        if ignore_whitespace:
+            options += ['--ignore-blank-lines', '--ignore-space-change']
+
+        revision = self._resolve_revision(revision)
+        if '..' in revision:
+            command = ['diff'] + options + [revision]
+        else:
+            # 解析commit会用到Repo上常驻的cat-file进程，需要持有仓库锁
+            with self._lock:
+                parents = [parent.hexsha for parent in self.repo.commit(revision).parents]
+            if parents:
+                command = ['diff'] + options + [parents[0], revision]
+            else:
+                command = ['diff-tree', '-p', '-r', '--root', '--no-commit-id'] + options + [revision]
+        command = ['git', '-c', 'core.quotePath=false'] + command + ['--'] + list(paths or [])
+
+        process = self.repo.git.execute(command, as_process=True)
+        budget = [max_total_bytes]
+        current = None
+        try:
+            for line in process.stdout:
+                if line.startswith(b'diff --git '):
+                    if current is not None:
+                        yield self._finish_file(current)
+                    current = self._new_file(line, min(max_patch_bytes, budget[0]), budget)
+                elif current is not None:
+                    self._feed_line(current, line)
+            if current is not None:
+                yield self._finish_file(current)
+            process.wait()
+        finally:
+            if process.proc is not None and process.proc.poll() is None:
+                process.proc.kill()
+                process.proc.wait()
+
+    @_with_repo_lock
+    def get_commit_diff(self, revision: str, paths: Optional[List[str]] = None, ignore_whitespace: bool = True,
+                        max_patch_bytes: int = 64 * 1024, max_total_bytes: int = 1024 * 1024) -> Dict[str, Any]:
+        """
+        获取commit或提交区间内所有改动文件的diff，参数同 iter_commit_diff
+
+        Returns:
+            {
+                "revision": 传入的commit或区间,
+                "files": [iter_commit_diff 产出的文件详情],
+                "total_files": 改动文件数,
+                "additions": 总新增行数,
+                "deletions": 总删除行数,
+                "truncated": 是否有文件的patch被截断
+            }
+        """
+        try:
+            resolved = self._resolve_revision(revision)
+            cache_key = _DiffCache.make_key('commit_diff', resolved, sorted(paths or []), ignore_whitespace,
+                                            max_patch_bytes, max_total_bytes)
+            cached = _diff_cache.get(cache_key)
+            if cached is not None:
+                cached['revision'] = revision
+                return cached
+            files = list(self.iter_commit_diff(resolved, paths, ignore_whitespace, max_patch_bytes, max_total_bytes))
+        except Exception as e:
+            raise ValueError(f"获取diff失败: {str(e)}")
+        result = {
+            'revision': revision,
+            'files': files,
+            'total_files': len(files),
+            'additions': sum(f['additions'] for f in files),
+            'deletions': sum(f['deletions'] for f in files),
+            'truncated': any(f['truncated'] for f in files)
+        }
+        _diff_cache.put(cache_key, result)
+        return result
+
+    def _resolve_revision(self, revision: str) -> str:
+        """
+        把commit引用或 A..B / A...B 区间中的引用解析成完整SHA，省略的一端按HEAD处理
+        """
+        match = re.fullmatch(r'(.*?)(\.\.\.?)(.*)', revision)
+        with self._lock:
+            if match is None:
+                return self.repo.commit(revision).hexsha
+            start, dots, end = match.groups()
+            return self.repo.commit(start or 'HEAD').hexsha + dots + self.repo.commit(end or 'HEAD').hexsha
+
+    @_with_repo_lock
+    def get_log(self, path: str = None, author: str = None, since: str = None, until: str = None,
+                grep: str = None, max_count: int = 50, skip: int = 0, revision: str = 'HEAD') -> Dict[str, Any]:
+        """
+        查询提交历史，支持路径、作者、时间和提交信息过滤以及分页
+
+        首次调用时如果仓库没有commit-graph，会先生成带 changed-path Bloom 过滤器的
+        commit-graph，使按路径过滤的历史查询在大仓库上也足够快
+
+        Args:
+            path: 只包含修改过该路径的提交(可选)
+            author: 作者名或邮箱(正则，可选)
+            since: 起始时间，如 "2024-01-01" 或 "6 months ago"(可选)
+            until: 截止时间(可选)
+            grep: 提交信息匹配的正则(可选)
+            max_count: 每页提交数，至少为1
+            skip: 跳过的提交数(分页偏移)
+            revision: 从哪个引用开始查询，默认HEAD；不能以 "-" 开头
+
+        Returns:
+            {
+                "commits": [{"commit_hash", "author", "email", "date", "subject"}],
+                "skip": 本页偏移,
+                "has_more": 是否还有下一页,
+                "next_skip": 下一页的偏移(没有下一页时为None)
+            }
+        """
+        if max_count < 1:
+            raise ValueError(f"max_count必须大于0: {max_count}")
+        if skip < 0:
+            raise ValueError(f"skip不能为负数: {skip}")
+        # revision会原样放到命令行上，以 "-" 开头会被git当作选项解析
+        if not revision or revision.startswith('-'):
+            raise ValueError(f"无效的revision: {revision}")
+        try:
+            self._ensure_commit_graph()
+            args = ['--format=%x1e%H%x1f%an%x1f%ae%x1f%aI%x1f%s', f'--max-count={max_count + 1}', f'--skip={skip}']
+            if author:
+                args.append(f'--author={author}')
+            if since:
+                args.append(f'--since={since}')
+            if until:
+                args.append(f'--until={until}')
+            if grep:
+                args.append(f'--grep={grep}')
+            args.append(revision)
+            if path:
+                args += ['--', path]
+            output = self.repo.git.log(*args)
+        except Exception as e:
+            raise ValueError(f"获取提交历史失败: {str(e)}")
+
+        commits = []
+        for record in output.split('\x1e')[1:]:
+            commit_hash, author_name, email, date, subject = record.rstrip('\n').split('\x1f', 4)
+            commits.append({
+                'commit_hash': commit_hash,
+                'author': author_name,
+                'email': email,
+                'date': date,
+                'subject': subject
+            })
+        has_more = len(commits) > max_count
+        return {
+            'commits': commits[:max_count],
+            'skip': skip,
+            'has_more': has_more,
+            'next_skip': skip + max_count if has_more else None
+        }
+
+    @_with_repo_lock
+    def get_blame(self, file_path: str, revision: str = 'HEAD', start_line: int = None,
+                  end_line: int = None) -> Dict[str, Any]:
+        """
+        获取文件每一行最后一次修改所在的提交
+
+        结果按 (文件blob SHA, 路径) 缓存，同一版本的文件重复blame直接返回缓存。
+        文件的新版本如果由单个提交从已缓存的旧版本修改而来，只需要对比两个版本，
+        未改动的行沿用旧结果，改动的行归属到该提交，不必重新运行 git blame
+
+        Args:
+            file_path: 文件路径（相对于仓库根目录）
+            revision: commit哈希或引用，默认HEAD
+            start_line: 起始行号，从1开始(可选)
+            end_line: 结束行号，包含该行(可选)
+
+        Returns:
+            {
+                "file_path": 文件路径,
+                "revision": 传入的引用,
+                "blob": 文件blob SHA,
+                "total_lines": 文件总行数,
+                "lines": [{"line": 行号, "commit_hash": 提交, "orig_line": 在该提交中的行号}],
+                "commits": {提交SHA: {"author", "email", "date", "summary"}}
+            }
+        """
+        try:
+            commit = self.repo.commit(revision)
+            blob_sha = (commit.tree / file_path).hexsha
+            blame = self._blame_blob(commit, file_path, blob_sha)
+        except Exception as e:
+            raise ValueError(f"获取blame失败: {str(e)}")
+
+        start = max(start_line or 1, 1)
+        end = min(end_line or len(blame['lines']), len(blame['lines']))
+        lines = [
+            {'line': number, 'commit_hash': commit_hash, 'orig_line': orig_line}
+            for number, (commit_hash, orig_line) in enumerate(blame['lines'][start - 1:end], start)
+        ]
+        used = {line['commit_hash'] for line in lines}
+        return {
+            'file_path': file_path,
+            'revision': revision,
+            'blob': blob_sha,
+            'total_lines': len(blame['lines']),
+            'lines': lines,
+            'commits': {commit_hash: info for commit_hash, info in blame['commits'].items() if commit_hash in used}
+        }
+
+    def _blame_blob(self, commit: Commit, file_path: str, blob_sha: str) -> Dict[str, Any]:
+        """获取(并缓存)某个版本文件的完整blame，lines 中每项为 [提交SHA, 原始行号]"""
+        cache_key = _DiffCache.make_key('blame', blob_sha, file_path)
+        blame = _diff_cache.get(cache_key)
+        if blame is None:
+            blame = self._blame_from_parent(commit, file_path, blob_sha) or self._run_blame(commit.hexsha, file_path)
+            _diff_cache.put(cache_key, blame)
+        return blame
+
+    def _blame_from_parent(self, commit: Commit, file_path: str, blob_sha: str) -> Optional[Dict[str, Any]]:
+        """
+        在上一版本的blame已缓存时增量计算blame，无法增量计算时返回None
+        """
+        last_hash = self.repo.git.log('-1', '--format=%H', commit.hexsha, '--', file_path).strip()
+        if not last_hash:
+            return None
+        change = self.repo.commit(last_hash)
+        # 合并提交的行可能来自任一父提交，交给 git blame 处理
+        if len(change.parents) != 1:
+            return None
+        try:
+            old_sha = (change.parents[0].tree / file_path).hexsha
+            if (change.tree / file_path).hexsha != blob_sha:
+                return None
+        except KeyError:
+            return None
+        old_blame = _diff_cache.get(_DiffCache.make_key('blame', old_sha, file_path))
+        if old_blame is None:
+            return None
+
+        old_lines = old_blame['lines']
+        lines = []
+        old_pos = 0
+        diff_text = self.repo.git.diff('-U0', '--no-color', '--no-ext-diff', old_sha, blob_sha)
+        for match in re.finditer(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@', diff_text, re.MULTILINE):
+            old_start, old_count, new_start, new_count = (
+                int(match.group(1)), int(match.group(2) or 1), int(match.group(3)), int(match.group(4) or 1)
+            )
+            # 行数为0时起始行号指向插入/删除位置之前的一行
+            old_before = old_start - 1 if old_count else old_start
+            lines.extend(old_lines[old_pos:old_before])
+            lines.extend([change.hexsha, new_start + i] for i in range(new_count))
+            old_pos = old_before + old_count
+        lines.extend(old_lines[old_pos:])
+
+        commits = dict(old_blame['commits'])
+        commits[change.hexsha] = {
+            'author': change.author.name,
+            'email': change.author.email,
+            'date': change.authored_datetime.isoformat(),
+            'summary': change.summary
+        }
+        used = {commit_hash for commit_hash, _ in lines}
+        return {'lines': lines, 'commits': {k: v for k, v in commits.items() if k in used}}
+
+    def _run_blame(self, commit_hash: str, file_path: str) -> Dict[str, Any]:
+        """运行 git blame --incremental，边读取输出边组装每行的归属"""
+        process = self.repo.git.execute(['git', 'blame', '--incremental', commit_hash, '--', file_path],
+                                        as_process=True)
+        by_line = {}
+        raw_commits = {}
+        current = None
+        try:
+            for raw in process.stdout:
+                text = raw.decode('utf-8', errors='replace').rstrip('\n')
+                if current is None:
+                    # 每组以 "<SHA> <原始行号> <最终行号> <行数>" 开头
+                    sha, orig_line, final_line, count = text.split()[:4]
+                    for i in range(int(count)):
+                        by_line[int(final_line) + i] = [sha, int(orig_line) + i]
+                    current = raw_commits.setdefault(sha, {})
+                    continue
+                key, _, value = text.partition(' ')
+                if key == 'filename':
+                    current = None
+                else:
+                    current[key] = value
+            process.wait()
+        finally:
+            if process.proc is not None and process.proc.poll() is None:
+                process.proc.kill()
+                process.proc.wait()
+
+        commits = {}
+        for sha, info in raw_commits.items():
+            tz = info.get('author-tz', '+0000')
+            offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5])) * (-1 if tz.startswith('-') else 1)
+            date = datetime.fromtimestamp(int(info.get('author-time', 0)), timezone(offset))
+            commits[sha] = {
+                'author': info.get('author', ''),
+                'email': info.get('author-mail', '').strip('<>'),
+                'date': date.isoformat(),
+                'summary': info.get('summary', '')
+            }
+        return {'lines': [by_line[number] for number in sorted(by_line)], 'commits': commits}
+
+    def _ensure_commit_graph(self):
+        """仓库没有commit-graph时生成一份带changed-path Bloom过滤器的commit-graph，每个仓库只检查一次"""
+        common_dir = os.path.realpath(self.repo.common_dir)
+        if common_dir in _commit_graph_checked:
+            return
+        info_dir = os.path.join(common_dir, 'objects', 'info')
+        if not (os.path.exists(os.path.join(info_dir, 'commit-graph'))
+                or os.path.exists(os.path.join(info_dir, 'commit-graphs', 'commit-graph-chain'))):
+            try:
+                self.repo.git.commit_graph('write', '--reachable', '--changed-paths')
+            except Exception as e:
+                # git版本过旧或仓库只读时退回普通的 git log
+                logger.warning("生成commit-graph失败: %s", e)
+        _commit_graph_checked.add(common_dir)
+
+    @staticmethod
+    def diff_cache_stats() -> Dict[str, Any]:
+        """返回diff结果缓存的命中统计"""
+        return _diff_cache.stats()
+
+    @staticmethod
+    def _new_file(header: bytes, limit: int, budget: list) -> Dict[str, Any]:
+        """根据 diff --git 头创建文件解析状态"""
+        rest = header[len(b'diff --git '):].rstrip(b'\n').decode('utf-8', errors='replace')
+        # 未重命名时头部为 "a/路径 b/路径"，两段路径相同
+        half = (len(rest) - 5) // 2
+        path = rest[2:2 + half] if half > 0 else rest
+        return {
+            'file_path': path,
+            'old_path': None,
+            'change_type': 'M',
+            'additions': 0,
+            'deletions': 0,
+            'is_binary': False,
+            'in_hunk': False,
+            'patch': [],
+            'patch_bytes': 0,
+            'dropped_bytes': 0,
+            'truncated': False,
+            'limit': limit,
+            'budget': budget
+        }
+
+    @staticmethod
+    def _feed_line(state: Dict[str, Any], line: bytes):
+        """处理一行diff输出：头部用于识别变更类型和路径，hunk部分统计行数并按上限保留patch"""
+        if not state['in_hunk']:
+            if line.startswith(b'@@'):
+                state['in_hunk'] = True
+            else:
+                text = line.rstrip(b'\n').decode('utf-8', errors='replace')
+                if text.startswith('new file mode'):
+                    state['change_type'] = 'A'
+                elif text.startswith('deleted file mode'):
+                    state['change_type'] = 'D'
+                elif text.startswith(('rename from ', 'copy from ')):
+                    state['change_type'] = 'R' if text.startswith('rename') else 'C'
+                    state['old_path'] = text.split(' ', 2)[2]
+                elif text.startswith(('rename to ', 'copy to ')):
+                    state['file_path'] = text.split(' ', 2)[2]
+                elif text.startswith('+++ b/'):
+                    # 路径含空格时git会在末尾补一个制表符
+                    state['file_path'] = text[len('+++ b/'):].rstrip('\t')
+                elif text.startswith('--- a/') and state['change_type'] == 'D':
+                    state['file_path'] = text[len('--- a/'):].rstrip('\t')
+                elif text.startswith('Binary files '):
+                    state['is_binary'] = True
+                return
+        elif line.startswith(b'+'):
+            state['additions'] += 1
+        elif line.startswith(b'-'):
+            state['deletions'] += 1
+
+        if not state['truncated'] and state['patch_bytes'] + len(line) <= state['limit']:
+            state['patch'].append(line)
+            state['patch_bytes'] += len(line)
+        else:
+            # 一旦有行被丢弃，后面的行即使放得下也不再保留，截断后的patch只能是开头连续的一段
+            state['truncated'] = True
+            state['dropped_bytes'] += len(line)
+
+    @staticmethod
+    def _finish_file(state: Dict[str, Any]) -> Dict[str, Any]:
+        """结束一个文件的解析，扣除总字节预算并生成结果"""
+        state['budget'][0] -= state['patch_bytes']
+        diff_text = b''.join(state['patch']).decode('utf-8', errors='replace')
+        truncated = state['dropped_bytes'] > 0
+        if truncated:
+            diff_text += f"\n... [已截断 {state['dropped_bytes']} 字节]\n"
+        return {
+            'file_path': state['file_path'],
+            'old_path': state['old_path'],
+            'change_type': state['change_type'],
+            'additions': state['additions'],
+            'deletions': state['deletions'],
+            'is_binary': state['is_binary'],
+            'diff_text': diff_text,
+            'truncated': truncated
+        }
 
 
 def get_diff(file_path: str, commit_hash: str, repo_path: str = None) -> Dict[str, Any]:
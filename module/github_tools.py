@@ -1,21 +1,203 @@
 import os
 import re
-import requests
-from typing import Optional, Dict, Any
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
 from urllib.parse import urlparse
+from module.http_client import HttpClient, RETRY_STATUS
+
+# GitHub API 地址，可通过环境变量指向本地替身服务
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+# 条件请求缓存(ETag + 响应体)的sqlite文件路径
+GITHUB_CACHE_PATH = os.getenv(
+    'GITHUB_CACHE_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'mcp_collection', 'github_api.sqlite3')
+)
+# 触发限流时单次请求最多排队等待的秒数，超过后照常发送
+GITHUB_MAX_WAIT = float(os.getenv('GITHUB_MAX_WAIT', '60'))
+# 剩余配额低于该值时开始把请求均匀分散到配额重置前
+GITHUB_RATE_LOW_WATER = 50
+# 单个GraphQL查询的最大估算代价，每个仓库按 repository + latestRelease 两个节点计
+GRAPHQL_MAX_COST = 100
+GRAPHQL_REPO_COST = 2
+# 查询过大(节点数、复杂度超限或执行超时)时GraphQL返回的错误类型，只有这类错误值得拆小重试
+GRAPHQL_SPLIT_ERROR_TYPES = {'MAX_NODE_LIMIT_EXCEEDED', 'RESOURCE_LIMITS_EXCEEDED'}
+GRAPHQL_SPLIT_ERROR_PATTERN = re.compile(r'complexity|timeout|timed out', re.IGNORECASE)
+
+
+class _ResponseCache:
+    """
+    GitHub API响应的磁盘缓存
+
+    保存每个URL最近一次200响应的ETag/Last-Modified和响应体，
+    请求时带上 If-None-Match，服务端返回304时直接使用缓存的响应体，
+    304响应不计入GitHub API配额
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT, updated_at REAL)'
+            )
+        return self._conn
+
+    def get(self, url: str):
+        """返回 (etag, last_modified, body)，没有缓存时返回None"""
+        with self._lock:
+            return self._connect().execute(
+                'SELECT etag, last_modified, body FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+
+    def put(self, url: str, etag: str, last_modified: str, body: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (url, etag, last_modified, body, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (url, etag, last_modified, body, time.time())
+            )
+            conn.commit()
+
+
+class _RateLimiter:
+    """
+    GitHub API的客户端限流器，进程内所有并发的工具调用共用
+
+    根据响应中的 X-RateLimit-Remaining / X-RateLimit-Reset 跟踪剩余配额：
+    配额充足时不限速；低于 GITHUB_RATE_LOW_WATER 后把剩余配额均匀分散到
+    重置前的时间里；配额耗尽或收到 Retry-After 时暂停发送直到可用。
+    每个请求最多等待 max_wait 秒
+    """
+
+    def __init__(self, max_wait: float = GITHUB_MAX_WAIT):
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._remaining = None
+        self._reset_at = 0.0
+        self._blocked_until = 0.0
+        self._last_sent = 0.0
+        self.waiting = 0
+        self.requests = 0
+        self.delayed_requests = 0
+        self.total_wait = 0.0
+        self.longest_wait = 0.0
+
+    def _delay(self, now: float) -> float:
+        """返回发送下一个请求前还需等待的秒数"""
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        if self._remaining is None or self._reset_at <= now:
+            return 0.0
+        if self._remaining <= 0:
+            return self._reset_at - now
+        if self._remaining > GITHUB_RATE_LOW_WATER:
+            return 0.0
+        interval = (self._reset_at - now) / self._remaining
+        return max(0.0, self._last_sent + interval - now)
+
+    def acquire(self):
+        """等待到可以发送请求为止，最多等待 max_wait 秒"""
+        start = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    delay = self._delay(time.time())
+                    left = self.max_wait - (time.monotonic() - start)
+                    if delay <= 0 or left <= 0:
+                        break
+                    self._cond.wait(min(delay, left))
+                if self._remaining and self._reset_at > time.time():
+                    self._remaining -= 1
+                self._last_sent = time.time()
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - start
+            self.requests += 1
+            if waited > 0.001:
+                self.delayed_requests += 1
+                self.total_wait += waited
+                self.longest_wait = max(self.longest_wait, waited)
+
+    def update(self, response) -> bool:
+        """
+        根据响应头更新配额状态
+
+        Returns:
+            响应是否为被限流拒绝(403/429且配额耗尽或带Retry-After)
+        """
+        headers = response.headers
+        now = time.time()
+        with self._cond:
+            if 'X-RateLimit-Remaining' in headers:
+                self._remaining = int(headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Reset' in headers:
+                self._reset_at = float(headers['X-RateLimit-Reset'])
+            retry_after = headers.get('Retry-After')
+            if retry_after:
+                try:
+                    self._blocked_until = max(self._blocked_until, now + float(retry_after))
+                except ValueError:
+                    try:
+                        self._blocked_until = max(self._blocked_until, parsedate_to_datetime(retry_after).timestamp())
+                    except (TypeError, ValueError):
+                        pass
+            limited = response.status_code in (403, 429) and (self._remaining == 0 or bool(retry_after))
+            if limited and self._remaining == 0:
+                self._blocked_until = max(self._blocked_until, self._reset_at)
+            self._cond.notify_all()
+            return limited
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": self.waiting,
+                "remaining": self._remaining,
+                "reset_at": int(self._reset_at) or None,
+                "requests": self.requests,
+                "delayed_requests": self.delayed_requests,
+                "total_wait_seconds": round(self.total_wait, 3),
+                "max_wait_seconds": round(self.longest_wait, 3),
+                "avg_wait_seconds": round(self.total_wait / self.delayed_requests, 3) if self.delayed_requests else 0.0
+            }
+
+
+_response_cache = _ResponseCache(GITHUB_CACHE_PATH)
+# GitHub请求使用单独的HTTP客户端：429不在连接层按 Retry-After 重试，
+# 交给 _send 经过限流器排队，等待时间受 GITHUB_MAX_WAIT 限制
+_http_client = HttpClient(retry_status=tuple(status for status in RETRY_STATUS if status != 429),
+                          respect_retry_after=False)
+# REST 和 GraphQL 的配额分开计算
+_rate_limiters = {
+    'core': _RateLimiter(),
+    'graphql': _RateLimiter()
+}
 
 
 class GitHubTools:
     """GitHub工具类，提供GitHub项目信息获取功能"""
-    
+
     @staticmethod
-    def get_github_repo_info(repo_url: str) -> Optional[Dict[str, Any]]:
+    def get_github_repo_info(repo_url: str, backend: str = 'rest') -> Optional[Dict[str, Any]]:
         """
         获取GitHub仓库的最新版本、更新日期和更新说明
-        
+
         Args:
             repo_url: GitHub仓库URL
-            
+            backend: 'rest' 或 'graphql'，见 get_github_repos_info
+
         Returns:
             包含版本信息的字典，格式如下：
             {
@@ -26,11 +208,67 @@ class GitHubTools:
                 "error": "错误信息（如果有）"
             }
         """
+        if backend == 'graphql':
+            return GitHubTools.get_github_repos_info([repo_url], backend='graphql')['results'][0]
+        return GitHubTools._fetch_repo_info(repo_url, {})
+
+    @staticmethod
+    def get_github_repos_info(repo_urls: List[str], max_workers: int = 8, backend: str = 'rest') -> Dict[str, Any]:
+        """
+        并发获取多个GitHub仓库的最新版本信息
+
+        Args:
+            repo_urls: GitHub仓库URL列表
+            max_workers: 并发请求数
+            backend: 'rest' 每个仓库单独请求REST API；'graphql' 把多个仓库合并到
+                一个GraphQL查询中，需要GITHUB_TOKEN，出错的仓库退回REST
+
+        Returns:
+            {
+                "results": [与 get_github_repo_info 相同格式的结果，顺序与输入一致],
+                "from_cache": 全部请求都命中缓存(304)的仓库数,
+                "rate_limit_remaining": 最近一次响应中的剩余配额,
+                "rate_limit_reset": 配额重置时间(Unix时间戳)
+            }
+        """
+        def fetch_one(repo_url):
+            meta = {}
+            return GitHubTools._fetch_repo_info(repo_url, meta), meta
+
+        graphql_results = {}
+        if backend == 'graphql' and os.getenv('GITHUB_TOKEN'):
+            graphql_results = GitHubTools._fetch_repos_graphql(repo_urls, max_workers)
+
+        # GraphQL没有拿到结果的仓库走REST
+        rest_urls = [url for url in repo_urls if url not in graphql_results]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rest_urls) or 1))) as pool:
+            rest_results = dict(zip(rest_urls, pool.map(fetch_one, rest_urls)))
+        fetched = [graphql_results.get(url) or rest_results[url] for url in repo_urls]
+
+        summary = {
+            "results": [result for result, _ in fetched],
+            "from_cache": sum(1 for _, meta in fetched if meta.get('requests') and meta.get('cached') == meta.get('requests')),
+            "rate_limit_remaining": None,
+            "rate_limit_reset": None
+        }
+        # 取最晚收到的配额信息
+        latest = max((meta for _, meta in fetched if meta.get('rate_limit_at')),
+                     key=lambda meta: meta['rate_limit_at'], default=None)
+        if latest:
+            summary["rate_limit_remaining"] = latest.get('rate_limit_remaining')
+            summary["rate_limit_reset"] = latest.get('rate_limit_reset')
+        return summary
+
+    @staticmethod
+    def _fetch_repo_info(repo_url: str, meta: dict) -> Optional[Dict[str, Any]]:
+        """
+        获取单个仓库信息，meta 中记录请求数、缓存命中数和配额信息
+        """
         try:
             # 解析仓库URL
             parsed_url = urlparse(repo_url)
             path_parts = parsed_url.path.strip('/').split('/')
-            
+
             # 支持多种GitHub URL格式
             if len(path_parts) >= 2:
                 owner = path_parts[0]
@@ -39,102 +277,351 @@ class GitHubTools:
                 return {
                     "error": "无效的GitHub仓库URL格式"
                 }
-            
+
             # 构造API URL
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/releases/latest"
-            
-            # Prepare headers with authentication if available
-            headers = {
-                'Accept': 'application/vnd.github.v3+json',
-                'User-Agent': 'MCP-GitHub-Tool'
-            }
-            
-            # Check if there's a GitHub token in environment variables
-            github_token = os.getenv('GITHUB_TOKEN')
-            if github_token:
-                headers['Authorization'] = f'token {github_token}'
-            
-            response = requests.get(api_url, headers=headers)
-            
-            if response.status_code == 200:
-                release_data = response.json()
-                
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/releases/latest"
+
+            headers = GitHubTools._build_headers()
+            status_code, release_data = GitHubTools._api_get(api_url, headers, meta)
+
+            if status_code == 200:
                 # 提取所需信息
                 repo_name = f"{owner}/{repo}"
                 latest_version = release_data.get('tag_name', 'N/A')
                 update_date = release_data.get('published_at', 'N/A')
                 release_notes = release_data.get('body', 'No release notes available')
-                
+
                 # 格式化日期
                 if update_date != 'N/A':
                     # 将ISO格式日期转换为更易读的格式
                     update_date = update_date.split('T')[0]  # 只取日期部分
-                
+
                 return {
                     "repo_name": repo_name,
                     "latest_version": latest_version,
                     "update_date": update_date,
                     "release_notes": release_notes
                 }
-            elif response.status_code == 404:
+            elif status_code == 404:
                 # 可能是没有发布版本，尝试获取最新提交信息
-                return GitHubTools._get_repo_commit_info(owner, repo, headers)
-            elif response.status_code == 403:
+                return GitHubTools._get_repo_commit_info(owner, repo, headers, meta)
+            elif status_code == 403:
                 return {
                     "error": f"API访问被拒绝 (403)。这可能是由于GitHub API速率限制。请设置GITHUB_TOKEN环境变量以提高API配额。"
                 }
             else:
                 return {
-                    "error": f"获取仓库信息失败，状态码: {response.status_code}"
+                    "error": f"获取仓库信息失败，状态码: {status_code}"
                 }
-                
+
         except Exception as e:
             return {
                 "error": f"获取仓库信息时发生错误: {str(e)}"
             }
-    
+
+    @staticmethod
+    def _parse_repo_url(repo_url: str):
+        """解析仓库URL，返回 (owner, repo)，格式无效时返回None"""
+        path_parts = urlparse(repo_url).path.strip('/').split('/')
+        if len(path_parts) >= 2 and path_parts[0] and path_parts[1]:
+            return path_parts[0], path_parts[1]
+        return None
+
     @staticmethod
-    def _get_repo_commit_info(owner: str, repo: str, headers: dict) -> Optional[Dict[str, Any]]:
+    def _fetch_repos_graphql(repo_urls: List[str], max_workers: int) -> Dict[str, Any]:
+        """
+        通过GraphQL批量获取仓库信息，按查询代价把仓库分批，各批并发请求
+
+        Returns:
+            仓库URL到 (结果, meta) 的字典，只包含GraphQL成功返回的仓库
+        """
+        repos = []
+        for url in dict.fromkeys(repo_urls):
+            parsed = GitHubTools._parse_repo_url(url)
+            if parsed:
+                repos.append((url, parsed[0], parsed[1]))
+
+        batch_size = max(1, GRAPHQL_MAX_COST // GRAPHQL_REPO_COST)
+        batches = [repos[i:i + batch_size] for i in range(0, len(repos), batch_size)]
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches) or 1))) as pool:
+            for batch_results in pool.map(GitHubTools._graphql_batch, batches):
+                results.update(batch_results)
+        return results
+
+    @staticmethod
+    def _graphql_batch(batch: list) -> Dict[str, Any]:
+        """
+        用一个带别名的GraphQL查询获取一批仓库
+
+        查询因代价过高或超时整体失败时对半拆分重试；认证失败、服务端错误和网络错误
+        与查询大小无关，拆分只会多发请求，整批直接交给REST
+        """
+        if not batch:
+            return {}
+        variables = {}
+        fields = []
+        params = []
+        for i, (_, owner, repo) in enumerate(batch):
+            variables[f'o{i}'] = owner
+            variables[f'n{i}'] = repo
+            params.append(f'$o{i}: String!, $n{i}: String!')
+            fields.append(
+                f'r{i}: repository(owner: $o{i}, name: $n{i}) {{ '
+                'updatedAt latestRelease { tagName publishedAt description } }'
+            )
+        query = f"query({', '.join(params)}) {{ {' '.join(fields)} rateLimit {{ remaining resetAt }} }}"
+
+        meta = {'requests': 1}
+        try:
+            response = GitHubTools._send('POST', f"{GITHUB_API_URL}/graphql", 'graphql',
+                                         headers=GitHubTools._build_headers(),
+                                         json={'query': query, 'variables': variables})
+            if response.status_code != 200:
+                return {}
+            payload = response.json()
+        except Exception:
+            return {}
+
+        data = payload.get('data') if isinstance(payload, dict) else None
+        if not data:
+            # 只有代价过高或超时才拆成两半重试，其他错误和单个仓库交给REST
+            if len(batch) == 1 or not GitHubTools._graphql_too_large(payload):
+                return {}
+            middle = len(batch) // 2
+            results = GitHubTools._graphql_batch(batch[:middle])
+            results.update(GitHubTools._graphql_batch(batch[middle:]))
+            return results
+
+        rate_limit = data.get('rateLimit') or {}
+        if 'remaining' in rate_limit:
+            meta['rate_limit_remaining'] = rate_limit['remaining']
+            if rate_limit.get('resetAt'):
+                # 与REST的 X-RateLimit-Reset 保持一致，转换为Unix时间戳
+                meta['rate_limit_reset'] = int(datetime.fromisoformat(rate_limit['resetAt']).timestamp())
+            meta['rate_limit_at'] = time.monotonic()
+
+        results = {}
+        for i, (url, owner, repo) in enumerate(batch):
+            node = data.get(f'r{i}')
+            if not node:
+                # 该仓库出错(不存在、无权限等)，交给REST处理
+                continue
+            release = node.get('latestRelease')
+            if release:
+                result = {
+                    "repo_name": f"{owner}/{repo}",
+                    "latest_version": release.get('tagName') or 'N/A',
+                    "update_date": (release.get('publishedAt') or 'N/A').split('T')[0],
+                    "release_notes": release.get('description') or 'No release notes available'
+                }
+            else:
+                result = {
+                    "repo_name": f"{owner}/{repo}",
+                    "latest_version": "No releases",
+                    "update_date": (node.get('updatedAt') or 'N/A').split('T')[0],
+                    "release_notes": "Repository has no official releases, only commits"
+                }
+            # 同一批仓库共用一次请求，配额信息只记在第一个结果上
+            results[url] = (result, meta if i == 0 else {})
+        return results
+
+    @staticmethod
+    def _graphql_too_large(payload) -> bool:
+        """判断GraphQL错误响应是否由查询代价过高或执行超时引起"""
+        errors = payload.get('errors') if isinstance(payload, dict) else None
+        for error in errors or []:
+            if not isinstance(error, dict):
+                continue
+            if error.get('type') in GRAPHQL_SPLIT_ERROR_TYPES:
+                return True
+            if GRAPHQL_SPLIT_ERROR_PATTERN.search(error.get('message') or ''):
+                return True
+        return False
+
+    @staticmethod
+    def _build_headers() -> dict:
+        """构造请求头，环境变量中有GITHUB_TOKEN时带上认证信息"""
+        headers = {
+            'Accept': 'application/vnd.github.v3+json',
+            'User-Agent': 'MCP-GitHub-Tool'
+        }
+
+        # Check if there's a GitHub token in environment variables
+        github_token = os.getenv('GITHUB_TOKEN')
+        if github_token:
+            headers['Authorization'] = f'token {github_token}'
+        return headers
+
+    @staticmethod
+    def rate_limit_stats() -> Dict[str, Any]:
+        """返回各配额类型(core/graphql)限流器的排队和等待统计"""
+        return {resource: limiter.stats() for resource, limiter in _rate_limiters.items()}
+
+    @staticmethod
+    def _send(method: str, url: str, resource: str, **kwargs):
+        """
+        经过限流器发送请求，被限流拒绝时排队等待后重试一次
+        """
+        limiter = _rate_limiters[resource]
+        for attempt in range(2):
+            limiter.acquire()
+            response = _http_client.request(method, url, **kwargs)
+            if not limiter.update(response) or attempt == 1:
+                return response
+        return response
+
+    @staticmethod
+    def _api_get(api_url: str, headers: dict, meta: dict):
+        """
+        带ETag条件请求的GET
+
+        Returns:
+            (状态码, 解析后的JSON)，304时返回 (200, 缓存的JSON)
+        """
+        request_headers = dict(headers)
+        cached = _response_cache.get(api_url)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                request_headers['If-None-Match'] = etag
+            elif last_modified:
+                request_headers['If-Modified-Since'] = last_modified
+
+        response = GitHubTools._send('GET', api_url, 'core', headers=request_headers)
+        meta['requests'] = meta.get('requests', 0) + 1
+        if 'X-RateLimit-Remaining' in response.headers:
+            meta['rate_limit_remaining'] = int(response.headers['X-RateLimit-Remaining'])
+            meta['rate_limit_reset'] = int(response.headers.get('X-RateLimit-Reset', 0)) or None
+            meta['rate_limit_at'] = time.monotonic()
+
+        if response.status_code == 304 and cached:
+            meta['cached'] = meta.get('cached', 0) + 1
+            return 200, json.loads(cached[2])
+        if response.status_code == 200:
+            _response_cache.put(api_url, response.headers.get('ETag'),
+                                response.headers.get('Last-Modified'), response.text)
+            return 200, response.json()
+        return response.status_code, None
+
+    @staticmethod
+    def _get_repo_commit_info(owner: str, repo: str, headers: dict, meta: dict = None) -> Optional[Dict[str, Any]]:
         """
         当没有发布版本时，获取仓库的最新提交信息作为替代
-        
+
         Args:
             owner: 仓库所有者
             repo: 仓库名
             headers: 请求头（包含认证信息）
-            
+            meta: 记录请求统计的字典（可选）
+
         Returns:
             包含提交信息的字典
         """
         try:
             # 获取仓库信息
-            api_url = f"https://api.github.com/repos/{owner}/{repo}"
-            
-            response = requests.get(api_url, headers=headers)
-            
-            if response.status_code == 200:
-                repo_data = response.json()
-                
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}"
+
+            status_code, repo_data = GitHubTools._api_get(api_url, headers, {} if meta is None else meta)
+
+            if status_code == 200:
                 repo_name = f"{owner}/{repo}"
                 latest_version = "No releases"
                 update_date = repo_data.get('updated_at', 'N/A').split('T')[0]
                 release_notes = "Repository has no official releases, only commits"
-                
+
                 return {
                     "repo_name": repo_name,
                     "latest_version": latest_version,
                     "update_date": update_date,
                     "release_notes": release_notes
                 }
-            elif response.status_code == 403:
+            elif status_code == 403:
                 return {
                     "error": f"API访问被拒绝 (403)。这可能是由于GitHub API速率限制。请设置GITHUB_TOKEN环境变量以提高API配额。"
                 }
             else:
                 return {
-                    "error": f"获取仓库信息失败，状态码: {response.status_code}"
+                    "error": f"获取仓库信息失败，状态码: {status_code}"
                 }
         except Exception as e:
             return {
                 "error": f"获取仓库信息时发生错误: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+
+if __name__ == '__main__':
+    # 使用本地HTTP服务回放录制的GitHub响应，验证GraphQL出错时的拆分与REST回退：
+    # 认证失败(401)不应拆分，整批直接走REST；节点数超限时拆小重试，不再回退REST
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    RECORDED_UNAUTHORIZED = {
+        "message": "Bad credentials",
+        "documentation_url": "https://docs.github.com/graphql"
+    }
+    RECORDED_NODE_LIMIT = {
+        "data": None,
+        "errors": [{
+            "type": "MAX_NODE_LIMIT_EXCEEDED",
+            "message": "This query requests up to 51,000 possible nodes which exceeds the maximum limit of 500,000."
+        }]
+    }
+    RECORDED_REPO = {"full_name": "octo/repo", "updated_at": "2024-02-02T10:00:00Z"}
+    RECORDED_RELEASE = {"tag_name": "v1.0.0", "published_at": "2024-01-01T08:00:00Z", "body": "notes"}
+
+    class RecordedHandler(BaseHTTPRequestHandler):
+        scenario = 'unauthorized'
+        # 查询中的仓库数超过该值时返回节点数超限
+        max_repos = 10
+        counts = {'POST': 0, 'GET': 0}
+
+        def _reply(self, status, body, headers=()):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            RecordedHandler.counts['POST'] += 1
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            if RecordedHandler.scenario == 'unauthorized':
+                return self._reply(401, RECORDED_UNAUTHORIZED)
+            repos = len(body['variables']) // 2
+            if repos > RecordedHandler.max_repos:
+                return self._reply(200, RECORDED_NODE_LIMIT)
+            data = {f'r{i}': {"updatedAt": RECORDED_REPO['updated_at'],
+                              "latestRelease": {"tagName": RECORDED_RELEASE['tag_name'],
+                                                "publishedAt": RECORDED_RELEASE['published_at'],
+                                                "description": RECORDED_RELEASE['body']}}
+                    for i in range(repos)}
+            data['rateLimit'] = {"remaining": 4990, "resetAt": "2030-01-01T00:00:00+00:00"}
+            self._reply(200, {"data": data})
+
+        def do_GET(self):
+            RecordedHandler.counts['GET'] += 1
+            body = RECORDED_RELEASE if self.path.endswith('/releases/latest') else RECORDED_REPO
+            self._reply(200, body, [('X-RateLimit-Remaining', '4999'), ('X-RateLimit-Reset', '1893456000')])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RecordedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    GITHUB_API_URL = f'http://127.0.0.1:{server.server_port}'
+    os.environ.setdefault('GITHUB_TOKEN', 'recorded-token')
+    urls = [f'https://github.com/octo/repo{i}' for i in range(50)]
+    for scenario in ('unauthorized', 'node_limit'):
+        RecordedHandler.scenario = scenario
+        RecordedHandler.counts = {'POST': 0, 'GET': 0}
+        # 每个场景使用空的响应缓存，避免上一次的ETag影响请求数
+        _response_cache = _ResponseCache(os.path.join(tempfile.mkdtemp(), 'github_api.sqlite3'))
+        summary = GitHubTools.get_github_repos_info(urls, backend='graphql')
+        errors = sum(1 for result in summary['results'] if 'error' in result)
+        print(f'{scenario}: GraphQL请求数 {RecordedHandler.counts["POST"]}, '
+              f'REST请求数 {RecordedHandler.counts["GET"]}, 失败仓库数 {errors}')
+    server.shutdown()
@@ -0,0 +1,123 @@
+"""
+共享的HTTP客户端
+
+工具通过共享的连接池发请求，复用 keep-alive 连接，统一设置超时、
+对5xx/429自动退避重试(按 Retry-After 等待时有上限)，并在安装了brotli时支持br压缩。
+GitHub工具自行处理限流，使用不重试429的单独实例
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401  urllib3 安装了 brotli 后才会解码 br
+    _ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    _ACCEPT_ENCODING = 'gzip, deflate'
+
+# 默认 (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (5, 30)
+# 需要重试的状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# 重试前按 Retry-After 等待的最长秒数，服务端要求等待更久时只等这么久
+MAX_RETRY_AFTER = 10
+
+
+class _CappedRetry(Retry):
+    """Retry-After 不超过 MAX_RETRY_AFTER 的重试策略，避免一个429响应阻塞调用方数分钟"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+class HttpClient:
+    """带连接池、超时和重试的HTTP客户端"""
+
+    def __init__(self, pool_connections: int = 16, pool_maxsize: int = 8, timeout=DEFAULT_TIMEOUT,
+                 retries: int = 3, backoff_factor: float = 0.5, retry_status=RETRY_STATUS,
+                 respect_retry_after: bool = True):
+        """
+        Args:
+            pool_connections: 缓存连接池的主机数
+            pool_maxsize: 每个主机的最大连接数，超出时等待空闲连接
+            timeout: 默认超时，(连接超时, 读取超时) 或单个秒数
+            retries: 5xx/429 和连接错误的最大重试次数
+            backoff_factor: 指数退避系数，响应带 Retry-After 时优先使用该值(最多等待 MAX_RETRY_AFTER 秒)
+            retry_status: 需要重试的状态码，自行处理限流的调用方可以去掉429
+            respect_retry_after: 是否按 Retry-After 等待；开启时urllib3对带该头的429/503
+                总会重试，自行处理限流的调用方需要关闭
+        """
+        self.timeout = timeout
+        retry = _CappedRetry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_status,
+            respect_retry_after_header=respect_retry_after,
+            # 重试用尽时返回最后一次响应，由调用方按状态码处理
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=retry, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = _ACCEPT_ENCODING
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求，未指定timeout时使用默认超时"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """获取进程内共享的HTTP客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
+
+
+if __name__ == '__main__':
+    # 使用本地HTTP服务验证重试：前两次返回503，第三次返回200
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class FlakyHandler(BaseHTTPRequestHandler):
+        count = 0
+
+        def do_GET(self):
+            FlakyHandler.count += 1
+            status = 503 if FlakyHandler.count < 3 else 200
+            body = f'request {FlakyHandler.count}'.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = HttpClient(backoff_factor=0.1)
+    response = client.get(f'http://127.0.0.1:{server.server_port}/')
+    print(f'状态码: {response.status_code}, 内容: {response.text}, 服务端收到请求数: {FlakyHandler.count}')
+    server.shutdown()